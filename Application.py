@@ -1,13 +1,21 @@
+import time
+# measured from the first line, the start page has to show up without waiting for the pose model
+START_TIME = time.perf_counter()
 import tkinter as tk
 import tkinter.messagebox
 import os
-from PIL import Image, ImageTk
+import threading
 from tools.CameraStream import *
 from tools.MusicPlayer import *
-from UI.PlayingSence import StartPlay
+from tools.RenderScheduler import RenderScheduler
+from tools.ImageCache import ImageCache
+from tools.AssetCache import AssetCache
+from tools.SpeechPlayer import SpeechPlayer
+import yoga_toolkit.tips as tips
 from UI.StartPage import StartPage
 from UI.Menu import Menu
 from UI.Calibration import Calibration
+from yoga_toolkit.yogamat import YogaMat, serial_port
 
 class App(tk.Tk):
 	def __init__(self):
@@ -26,22 +34,51 @@ class App(tk.Tk):
 		menu_bar.add_cascade(label='Help')
 		self['menu'] = menu_bar
 
+		""" UI images, the start page background is loaded now and the others in the background """
+		self.image_cache = ImageCache(maxsize=32)
+		self.assets = AssetCache(self.image_cache)
+		back_img = self.assets.photo('background')
+		self.assets.warm_up()
+
 		""" window size """
-		back_img = Image.open('data/image/background.jpg').resize((1280, 800))
-		back_img = ImageTk.PhotoImage(back_img)
 		w, h = back_img.width(), back_img.height()
 		self.resizable(height=False, width=False)
 		self.geometry('%dx%d+300+100' % (w, h))
 		self.attributes('-alpha', 1)
 
-		""" camera """
-		self.vs = CameraStream()
+		""" frames are drawn on the main thread """
+		self.scheduler = RenderScheduler(self, fps=30)
+		self.scheduler.start()
+
+		""" camera; YOGA_CAMERA is a device index, device path, video file or image directory, YOGA_CAMERA_SIZE e.g. 1280x720 """
+		size = os.environ.get('YOGA_CAMERA_SIZE')
+		width, height = (int(value) for value in size.lower().split('x')) if size else (None, None)
+		fps = os.environ.get('YOGA_CAMERA_FPS')
+		self.vs = CameraStream(os.environ.get('YOGA_CAMERA', '0'), width=width, height=height, fps=float(fps) if fps else None, loop=True)
 		self.vs.start()
 
+		""" yoga mat, opened on first read; YOGA_MAT_PORT=none runs without the mat """
+		port = os.environ.get('YOGA_MAT_PORT', serial_port)
+		self.mat = YogaMat(None if port.lower() == 'none' else port)
+
+		""" session and mat logs of the practice screen; YOGA_LOG_DIR, default data/session_log """
+		self.log_dir = os.environ.get('YOGA_LOG_DIR', './data/session_log')
+		os.makedirs(self.log_dir, exist_ok=True)
+
 		""" background music """
 		self.bg_music = MusicPlayer()
 		self.bg_music.start()
 
+		""" speech, every known tip is synthesized once into data/voice_cache """
+		self.speech = SpeechPlayer()
+		self.speech.start()
+		self.speech.prerender(tips.allTips())
+
+		""" pose models, loaded on first practice of each pose; mediapipe is warmed up in the background during calibration """
+		self.models = {}
+		self.models_lock = threading.Lock()
+		self.warm_up_thread = None
+
 		""" init frame """
 		self.now_frame = None
 		self.switch_frame(StartPage, vs=self.vs)
@@ -55,12 +92,50 @@ class App(tk.Tk):
 		self.now_frame = new_frame
 		self.now_frame.pack(side='top', fill='both', expand=1)
 
+	def get_model(self, pose_type):
+		"""
+		a reset model of pose_type no other screen is using, given back with release_model
+		the workers of a closed practice screen may still be detecting, so a model is only reused once they stopped
+		"""
+		from yoga_toolkit.yogaPose import YogaPose
+		with self.models_lock:
+			idle = self.models.setdefault(pose_type, [])
+			model = idle.pop() if idle else None
+		if model is None:
+			model = YogaPose(pose_type)
+			model.initialDetect()
+		model.reset()
+		return model
+
+	def release_model(self, pose_type, model):
+		"""thread safe, model is idle again"""
+		with self.models_lock:
+			self.models.setdefault(pose_type, []).append(model)
+
+	def warm_up_model(self):
+		"""
+		import the pose model and build its mediapipe graph with a dummy inference on a background thread, once
+		"""
+		if self.warm_up_thread is None:
+			self.warm_up_thread = threading.Thread(target=self._warm_up, daemon=True)
+			self.warm_up_thread.start()
+
+	def _warm_up(self):
+		start = time.perf_counter()
+		import yoga_toolkit.toolkit as toolkit
+		import yoga_toolkit.yogaPose
+		toolkit.warmUp()
+		print(f'pose model ready in {time.perf_counter() - start:.2f} s')
+
 	def show_info(self):
 		tk.messagebox.showinfo("About", "This is a Yoga sample system.")
 
 	def _quit(self):
+		self.scheduler.stop()
 		self.vs.stop()
 		self.bg_music.stop()
+		self.speech.stop()
+		self.mat.close()
 		self.quit()
 		self.destroy()
 		try:
@@ -70,4 +145,5 @@ class App(tk.Tk):
 
 if __name__ == "__main__":
 	app = App()
+	app.after_idle(lambda: print(f'start page shown in {time.perf_counter() - START_TIME:.2f} s'))
 	app.mainloop()
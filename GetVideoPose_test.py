@@ -2,6 +2,9 @@ import os
 import cv2
 import mediapipe as mp
 import math as m
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+import yoga_toolkit.landmarkCache as landmarkCache
 
 def computeAngle(point1, centerPoint, point2):
     """compute joint poins angle
@@ -73,60 +76,49 @@ output = cv2.VideoWriter(storage_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (or
 print(original_width,original_height)
 fps = cap.get(cv2.CAP_PROP_FPS)
 
-with mp_pose.Pose(
-    min_detection_confidence=0.4,
-    min_tracking_confidence=0.4) as pose:
-    # Import video file
-        video_cap = cv2.VideoCapture(video_path)
-
-        if (video_cap.isOpened()== False): 
-            print("Error opening video  file")
-
-        success, image = video_cap.read()
-
-        if success:
-            print("success")
-        while True:
-            ret, img = cap.read()
-            if not ret:
-                print("Cannot receive frame")
-                break
-            #img = cv2.resize(img,(520,300))               # 縮小尺寸，加快演算速度
-            img2 = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)   # 將 BGR 轉換成 RGB
-            results = pose.process(img2)                  # 取得姿勢偵測結果
-            # 根據姿勢偵測結果，標記身體節點和骨架
-            mp_drawing.draw_landmarks(
-                img,
-                results.pose_landmarks,
-                mp_pose.POSE_CONNECTIONS,
-                landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style())
-            
-            BRIDGE_ANGLE = {
-                "LEFT_ELBOW": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST]],
-                "RIGHT_ELBOW": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST]],
-                "LEFT_SHOULDER": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP]],
-                "RIGHT_SHOULDER": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP]],
-                "LEFT_HIP": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE]],
-                "RIGHT_HIP": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE]],
-                "LEFT_KNEE": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE]],
-                "RIGHT_KNEE": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE]],
-                "LEFT_ANKLE": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE], results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_FOOT_INDEX]],
-                "RIGHT_ANKLE": [results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE], results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_FOOT_INDEX]],
-            }
-
-            angle_dict={}
-            for key,value in BRIDGE_ANGLE.items():
-                angle = computeAngle(list(getLandmarks(value[0],original_width,original_height)),
-                    list(getLandmarks(value[1],original_width,original_height)),
-                    list(getLandmarks(value[2],original_width,original_height)))
-                angle_dict[key] = angle
-            print(angle_dict)
-            
-            cv2.imshow('oxxostudio', img)
-            output.write(img)
-            if cv2.waitKey(5) == ord('q'):
-                break     # 按下 q 鍵停止
+# landmarks are computed once per video and then read from the cache
+landmarks, _ = landmarkCache.load(video_path, dict(min_detection_confidence=0.4, min_tracking_confidence=0.4))
+for row in landmarks:
+    ret, img = cap.read()
+    if not ret:
+        print("Cannot receive frame")
+        break
+    if np.isnan(row[0, 0, 0]):
+        continue
+    pose_landmarks = landmark_pb2.NormalizedLandmarkList(landmark=[landmark_pb2.NormalizedLandmark(x=x, y=y, z=z, visibility=v) for x, y, z, v in row[0].tolist()])
+    # 根據姿勢偵測結果，標記身體節點和骨架
+    mp_drawing.draw_landmarks(
+        img,
+        pose_landmarks,
+        mp_pose.POSE_CONNECTIONS,
+        landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style())
     
+    BRIDGE_ANGLE = {
+        "LEFT_ELBOW": [pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST]],
+        "RIGHT_ELBOW": [pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST]],
+        "LEFT_SHOULDER": [pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP]],
+        "RIGHT_SHOULDER": [pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP]],
+        "LEFT_HIP": [pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE]],
+        "RIGHT_HIP": [pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE]],
+        "LEFT_KNEE": [pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE]],
+        "RIGHT_KNEE": [pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE]],
+        "LEFT_ANKLE": [pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE], pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_FOOT_INDEX]],
+        "RIGHT_ANKLE": [pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE], pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_FOOT_INDEX]],
+    }
+
+    angle_dict={}
+    for key,value in BRIDGE_ANGLE.items():
+        angle = computeAngle(list(getLandmarks(value[0],original_width,original_height)),
+            list(getLandmarks(value[1],original_width,original_height)),
+            list(getLandmarks(value[2],original_width,original_height)))
+        angle_dict[key] = angle
+    print(angle_dict)
+    
+    cv2.imshow('oxxostudio', img)
+    output.write(img)
+    if cv2.waitKey(5) == ord('q'):
+        break     # 按下 q 鍵停止
+
 cap.release()
 output.release()
 cv2.destroyAllWindows()
\ No newline at end of file
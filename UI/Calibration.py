@@ -1,8 +1,8 @@
 import tkinter as tk
-import pyttsx3
-from PIL import Image, ImageTk
 import threading
+import time
 from yoga_toolkit.correction_toolkit import *
+from yoga_toolkit.colorSpace import RGB
 
 class Calibration(tk.Frame):
 	def __init__(self, master, name=None, vs=None):
@@ -11,10 +11,8 @@ class Calibration(tk.Frame):
 		self.is_running = False
 
 		tk.Label(self, text='Calibration Stage', fg='#B15BFF', font=('Comic Sans MS', 30, 'bold')).place(x=450, y=15)
-		icon = Image.open('data/image/finish.jpg').resize((50, 50))
-		iconimage = ImageTk.PhotoImage(icon)
+		iconimage = master.assets.photo('finish')
 		self.finish_btn = tk.Button(self, text='Finish', image=iconimage, command=self.stop)
-		self.finish_btn.photo = iconimage
 		self.finish_btn.place(x=1150, y=700)
 		self.hint = tk.Label(self, text='請調整瑜珈墊與鏡頭，使瑜珈墊放至框線當中', fg='#0072E3', font=('微軟正黑體', 16))
 		self.hint.place(x=400, y=700)
@@ -25,41 +23,47 @@ class Calibration(tk.Frame):
 		self.canvas.place(x=280, y=150)
 
 		self.vs = vs
+		self.scheduler = master.scheduler
 		self.thread = threading.Thread(target=self.update, daemon=True)
 
-		self.engine = pyttsx3.init()
-		self.engine.setProperty('rate', 150)
-		self.voice_thread = threading.Thread(target=self.voice, daemon=True)
+		self.speech = master.speech
 
 		self.start()
 		
 	def voice(self):
 		result = self.hint.cget("text")
-		self.engine.say(result)
-		self.engine.runAndWait()
+		self.speech.say(result, priority=0, interrupt=True)
 
 	def start(self):
 		self.is_running = True
 		self.thread.start()
-		self.voice_thread.start()
+		self.voice()
+		# the user spends a while here, the pose model is loaded meanwhile
+		self.master.warm_up_model()
 
 	def update(self):
+		last_time = 0
 		while self.is_running:
-			frame = self.vs.frame
-			if frame is not None:
-				try:
-					frame = correction(frame)
-					frame = cv2.flip(frame, 180)
-					frame = cv2.resize(frame, (self.width, self.height))
-					photo_image = ImageTk.PhotoImage(Image.fromarray(frame))
-					self.canvas.create_image(0, 0, anchor='nw', image=photo_image)
-					self.canvas.image = photo_image
-					self.canvas.update()
-				except:
-					print('cap stop')
+			frame, frame_time = self.vs.frame, self.vs.frame_time
+			if frame is None or frame_time == last_time:
+				time.sleep(0.005)
+				continue
+			last_time = frame_time
+			try:
+				# resize first, correction draws on the new frame instead of the shared camera frame
+				frame = cv2.resize(frame.to(RGB).image, (self.width, self.height))
+				frame = correction(frame)
+				frame = cv2.flip(frame, 180)
+			except Exception as e:
+				# one bad frame must not end the camera thread and freeze the calibration screen
+				print(f'calibration error: {e!r}')
+				continue
+			self.scheduler.submit(self.canvas, frame)
 
 	def stop(self):
+		# not joined on the Tk thread, the loop ends on is_running and a late frame of the destroyed canvas is dropped by the scheduler
 		self.is_running = False
+		self.scheduler.forget(self.canvas)
 		
 		from UI.Menu import Menu
 		self.master.switch_frame(Menu, vs=self.vs)
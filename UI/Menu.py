@@ -1,5 +1,4 @@
 import tkinter as tk
-from PIL import Image, ImageTk
 from UI.StartPage import StartPage
 from UI.TeachStage import TeachStage
 
@@ -26,8 +25,6 @@ class Menu(tk.Frame):
 		tk.Button(self, text='Pyramid pose', bg='#DDDDFF', font=('Comic Sans MS', 14)).place(x=320, y=550, relwidth=0.17, relheight=0.08)
 		tk.Button(self, text='Bridge pose', bg='#DDDDFF', font=('Comic Sans MS', 14)).place(x=720, y=550, relwidth=0.17, relheight=0.08)
 
-		icon = Image.open('data/image/return.jpg').resize((50, 50))
-		iconimage = ImageTk.PhotoImage(icon)
+		iconimage = master.assets.photo('return')
 		return_btn = tk.Button(self, text='Return', image=iconimage, command=lambda: master.switch_frame(StartPage, vs=self.vs))
-		return_btn.photo = iconimage
 		return_btn.place(x=1150, y=15)
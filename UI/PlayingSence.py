@@ -1,32 +1,38 @@
 import tkinter as tk
-import pyttsx3
-from PIL import Image, ImageTk
+import os
 import threading
 import time
+import datetime
 import tools.VideoPath as VideoPath
 from tools.VideoPlayer import VideoPlayer
 from yoga_toolkit.yogaPose import *
-""" Turn off the comment below if the yoga mat is connected. """
-# from yoga_toolkit.yogamat import get_heatmap
+from yoga_toolkit.yogamat import render_heatmap, open_mat_log
+from yoga_toolkit.matBalance import SwayMetrics
+from yoga_toolkit.colorSpace import Frame, BGR
+from yoga_toolkit.sessionLog import openSessionLog
 
 class StartPlay(tk.Frame):
 	def __init__(self, master, name, vs):
 		super().__init__(master)
 		self.master = master
 		self.is_running = False
+		self.stop_event = threading.Event()
 		self.is_paused = False
 		self.cnt_frame = 0		
 		self.txt_tmp = ""
 		self.img_path = "data/image/background.jpg"
+		""" text shown on the labels, written by the workers and copied to the StringVars on the main thread """
+		self.hint = ""
+		self.count_value = ""
+		self.balance = ""
+		self.finish_comment = None
 		
 		tk.Label(self, text=name, font=('Comic Sans MS', 30, 'bold'), fg='#B15BFF').place(x=500, y=15)
 		""" hint """
 		self.hint_text = tk.StringVar()
 		tk.Label(self, textvariable=self.hint_text, font=('微軟正黑體', 16), fg='#B15BFF').place(x=50, y=680)
-		icon = Image.open('data/image/return.jpg').resize((50, 50))
-		iconimage = ImageTk.PhotoImage(icon)
+		iconimage = master.assets.photo('return')
 		return_btn = tk.Button(self, text='Return', image=iconimage, command=self.stop)
-		return_btn.photo = iconimage
 		return_btn.place(x=1150, y=10)
 
 		self.width, self.height = 600, 500
@@ -34,12 +40,14 @@ class StartPlay(tk.Frame):
 		""" image """
 		self.canvas_img = tk.Canvas(self, width=self.width, height=self.height)
 		self.canvas_img.place(x=20, y=100)
+		self.hint_images = master.image_cache
 		self.img_thread = threading.Thread(target=self.change_image, daemon=True)
 
 		""" webcam """
 		self.canvas_cam = tk.Canvas(self, width=self.width, height=self.height)
 		self.canvas_cam.place(x=650, y=100)
 		self.vs = vs
+		self.scheduler = master.scheduler
 		self.web_thread = threading.Thread(target=self.cap_update, daemon=True)
 
 		""" counting """
@@ -47,68 +55,103 @@ class StartPlay(tk.Frame):
 		tk.Label(self, textvariable=self.count, font=('Comic Sans MS', 50, 'bold'), fg='#F00078', bg='#D0D0D0').place(x=1180, y=100)
 		self.counting_thread = threading.Thread(target=self.counting, daemon=True)
 
-		""" detect model"""
-		self.model = YogaPose(VideoPath.Yoga_Model[name])
-		self.model.initialDetect()
+		""" detect model, shared with the other visits of this pose """
+		self.pose_type = VideoPath.Yoga_Model[name]
+		self.model = master.get_model(self.pose_type)
 
 		""" audio """
-		self.engine = pyttsx3.init()
-		self.engine.setProperty('rate', 150)
+		self.speech = master.speech
 		self.voice_thread = threading.Thread(target=self.voice, daemon=True)
 
 		""" heatmap """
-		""" Turn off the comment below if the yoga mat is connected. """
-		# w, h = self.width, 150
-		# self.canvas_heatmap = tk.Canvas(self, width=w, height=h)
-		# self.canvas_heatmap.place(x=650, y=620)
-		# self.heatmap_thread = threading.Thread(target=self.heatmap_display, daemon=True)
-
+		self.mat = master.mat
+		w, h = self.width, 150
+		self.canvas_heatmap = tk.Canvas(self, width=w, height=h)
+		self.canvas_heatmap.place(x=650, y=620)
+		self.heatmap_thread = threading.Thread(target=self.heatmap_display, daemon=True)
+
+		""" balance """
+		self.sway = SwayMetrics()
+		self.balance_text = tk.StringVar()
+		tk.Label(self, textvariable=self.balance_text, font=('微軟正黑體', 14), fg='#0072E3').place(x=50, y=740)
+
+		self.workers = [self.web_thread, self.heatmap_thread, self.voice_thread, self.img_thread, self.counting_thread]
 		self.cap_start()
 
+	def refresh(self):
+		"""
+		This is a function used to update the labels from the main thread.
+		"""
+		if not self.is_running:
+			return
+		self.hint_text.set(self.hint)
+		self.count.set(self.count_value)
+		self.balance_text.set(self.balance)
+		if self.finish_comment is not None:
+			result = tk.messagebox.showinfo("Time's up", self.finish_comment)
+			if result == "ok":
+				self.count.set("")
+				self.cnt_frame = 0
+				self.stop()
+			return
+		self.after(100, self.refresh)
+
 	def change_image(self):
 		"""
 		This is a function used to change the image to give user a hint.
 		"""
+		size = (self.width, self.height)
+		self.hint_images.warm([self.img_path] + self.model.hintImagePaths(), size)
+		shown = None
 		while self.is_running:
 			img = self.img_path
-			try:
-				back_img = Image.open(img).resize((self.width, self.height))
-				back_img = ImageTk.PhotoImage(back_img)
-				self.canvas_img.create_image(0, 0, anchor='nw', image=back_img)
-				self.canvas_img.image = back_img
-			except:
-				pass
+			if img != shown:
+				try:
+					self.scheduler.submit(self.canvas_img, self.hint_images.get(img, size))
+					shown = img
+				except OSError:
+					pass
 
-			time.sleep(2)
+			self.stop_event.wait(0.2)
 
 	def heatmap_display(self):
 		"""
 		This is a function used to display the heatmap from the yoga mat.
 		"""
-		while self.is_running:
-			heatmap_frame = get_heatmap()
-			photo_image = ImageTk.PhotoImage(Image.fromarray(heatmap_frame))
-			self.canvas_heatmap.create_image(0, 0, anchor='nw', image=photo_image)
-			self.canvas_heatmap.image = photo_image
-			self.canvas_heatmap.update()
+		mat_log = None
+		try:
+			while self.is_running:
+				grid = self.mat.read()
+				if grid is None:
+					self.stop_event.wait(0.5)
+					continue
+				mat_time, mat_feature = self.mat.latest()
+				if mat_log is None:
+					current_date_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+					mat_log = open_mat_log(os.path.join(self.master.log_dir, f"output_mat_{current_date_time}.ylog"))
+				mat_log.append(mat_time, grid)
+				self.sway.update_feature(mat_time, mat_feature)
+				self.balance = f"重心晃動速度 {self.sway.velocity:.2f} 格/秒，左右重量 {self.sway.left_ratio * 100:.0f}% : {100 - self.sway.left_ratio * 100:.0f}%"
+				heatmap_frame = Frame(render_heatmap(mat_feature.grid), BGR)
+				self.scheduler.submit(self.canvas_heatmap, heatmap_frame)
+		finally:
+			if mat_log is not None:
+				mat_log.close()
 
 	def counting(self):
 		"""
 		This is a function used for countdown while pratice.
 		"""
-		self.count.set(30)
-		cnt_tmp = int(self.count.get())
-		while cnt_tmp > -1:
-			self.count.set(cnt_tmp)
-			time.sleep(1)
-			if cnt_tmp == 0:
-				self.is_paused = False
-				result = tk.messagebox.showinfo("Time's up", "comment here...")
-				if result == "ok":
-					self.count.set("")
-					self.cnt_frame = 0
-					self.stop()
-			cnt_tmp -= 1
+		for cnt_tmp in range(30, -1, -1):
+			self.count_value = str(cnt_tmp)
+			if self.stop_event.wait(1):
+				return
+		self.is_paused = False
+		comment = "comment here..."
+		if self.sway.count > 0:
+			balance = self.sway.summary()
+			comment = f"重心晃動速度 {balance['velocity']:.2f} 格/秒\n重心晃動範圍 {balance['area']:.2f} 平方格"
+		self.finish_comment = comment
 
 	def cap_start(self):
 		"""
@@ -116,30 +159,44 @@ class StartPlay(tk.Frame):
 		"""
 		self.is_running = True
 		self.web_thread.start()
-		""" Turn off the comment below if the yoga mat is connected. """
-		# self.heatmap_thread.start()	
+		self.heatmap_thread.start()
 		self.voice_thread.start()
 		self.img_thread.start()
+		self.refresh()
 
 	def cap_update(self):
 		"""
 		This is a function used to update the frame of the camera.
 		"""
-		while self.is_running:
-			frame = self.vs.frame
-			if frame is not None:
+		last_time = 0
+		first_detect = True
+		current_date_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+		session_log = openSessionLog(os.path.join(self.master.log_dir, f"output_session_{current_date_time}.ylog"), self.model)
+		try:
+			while self.is_running:
+				frame, frame_time = self.vs.frame, self.vs.frame_time
+				if frame is None or frame_time == last_time:
+					self.stop_event.wait(0.005)
+					continue
+				last_time = frame_time
+				detect_start = time.perf_counter()
 				try:
-					frame = cv2.resize(frame, (self.width, self.height))
-					frame = self.model.detect(frame, self.width, self.height, False)
-					# frame = cv2.flip(frame, 180)
-					photo_image = ImageTk.PhotoImage(Image.fromarray(frame))
-					self.canvas_cam.create_image(0, 0, anchor='nw', image=photo_image)
-					self.canvas_cam.image = photo_image
-					self.canvas_cam.update()
-					self.txt_tmp = self.model.tips
-					self.img_path = self.model.imagePath
-				except:
-					print('cap stop')
+					mat_feature = self.mat.feature_at(frame_time)
+					frame = self.model.detect(frame, self.width, self.height, False, mat_feature)
+				except Exception as e:
+					# one bad frame must not end the camera thread and freeze the practice screen
+					print(f'detect error: {e!r}')
+					continue
+				if first_detect:
+					# without the warm-up of Calibration this carries the mediapipe graph initialization
+					first_detect = False
+					print(f'first detection in {(time.perf_counter() - detect_start) * 1000:.0f} ms')
+				session_log.append(frame_time, self.model.point2d, self.model.point3d, self.model.detected)
+				self.scheduler.submit(self.canvas_cam, frame)
+				self.txt_tmp = self.model.tips
+				self.img_path = self.model.imagePath
+		finally:
+			session_log.close()
 
 	def voice(self):
 		"""
@@ -148,32 +205,49 @@ class StartPlay(tk.Frame):
 		while self.is_running:
 			if not self.is_paused:
 				if self.cnt_frame > 2:
-						self.hint_text.set("請維持動作30秒，開始計時")
+						self.hint = "請維持動作30秒，開始計時"
 						self.counting_thread.start()
 						self.is_paused = True
 						self.cnt_frame = -1
-				elif self.hint_text.get() == "" and self.cnt_frame != -1:
-					self.hint_text.set('開始偵測...')
-				elif self.count.get() == "0":
-					self.hint_text.set("練習結束，休息30秒")
+				elif self.hint == "" and self.cnt_frame != -1:
+					self.hint = '開始偵測...'
+				elif self.count_value == "0":
+					self.hint = "練習結束，休息30秒"
 				else:
-					self.hint_text.set(self.txt_tmp)
+					self.hint = self.txt_tmp
 
-				if self.hint_text.get() == "動作正確" and self.cnt_frame != -1:
+				if self.hint == "動作正確" and self.cnt_frame != -1:
 					self.cnt_frame += 1
-				try:
-					result = self.hint_text.get()
-					self.engine.say(result)
-					self.engine.runAndWait()
-				except:
-					# print('speech stop')
-					pass
+				result = self.hint
+				if self.cnt_frame == -1:
+					self.speech.say(result, priority=0, interrupt=True)
+				else:
+					self.speech.say(result)
 			else:
-				self.hint_text.set("")
-			time.sleep(2)
+				self.hint = ""
+			self.stop_event.wait(2)
 
 	def stop(self):
+		if self.stop_event.is_set():
+			return
 		self.is_running = False
+		self.stop_event.set()
+		for canvas in (self.canvas_img, self.canvas_cam, self.canvas_heatmap):
+			self.scheduler.forget(canvas)
+		# joined off the Tk thread, a worker blocked in a serial read or a camera grab must not freeze the UI
+		workers = [thread for thread in self.workers if thread.ident is not None and thread is not threading.current_thread()]
+		threading.Thread(target=self.join_workers, args=(workers,), daemon=True).start()
 
 		from UI.Menu import Menu
 		self.master.switch_frame(Menu, vs=self.vs)
+
+	def join_workers(self, workers):
+		stopped = True
+		for thread in workers:
+			thread.join(timeout=2)
+			if thread.is_alive():
+				print(f'{thread.name} did not stop in time')
+				stopped = False
+		# a worker still detecting keeps the model, the next practice screen gets a new one
+		if stopped:
+			self.master.release_model(self.pose_type, self.model)
@@ -1,5 +1,4 @@
 import tkinter as tk
-from PIL import Image, ImageTk
 from UI.Calibration import Calibration
 
 class StartPage(tk.Frame):
@@ -7,13 +6,11 @@ class StartPage(tk.Frame):
 		super().__init__(master)
 
 		""" background """
-		back_img = Image.open('data/image/background.jpg').resize((1280, 800))
-		back_img = ImageTk.PhotoImage(back_img)
+		back_img = master.assets.photo('background')
 		w, h = back_img.width(), back_img.height()
 		canvas = tk.Canvas(self, width=w, height=h)
 		canvas.place(x=0, y=0)
 		canvas.create_image(0, 0, anchor='nw', image=back_img)
-		canvas.image = back_img
 
 		label1 = tk.Label(self, text='Yoga Sample App', font=('Comic Sans MS', 36), fg='#B15BFF').place(x=380, y=100, relwidth=0.4, relheight=0.10)
 		tk.Button(self, text='Start', bg='#DDDDFF', font=('Comic Sans MS', 18), 
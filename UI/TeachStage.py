@@ -1,10 +1,12 @@
 import tkinter as tk
-from PIL import Image, ImageTk
 import threading
 import tools.VideoPath as VideoPath
 from tools.VideoPlayer import VideoPlayer
+import tools.VideoCache as VideoCache
 
 class TeachStage(tk.Frame):
+	video_size = (950, 500)
+
 	def __init__(self, master, name, vs):
 		super().__init__(master)
 		self.master = master
@@ -14,19 +16,17 @@ class TeachStage(tk.Frame):
 
 		tk.Label(self, text=name, font=('Comic Sans MS', 30, 'bold'), fg='#B15BFF').place(x=500, y=15)
 		tk.Label(self, text='影片教學', font=('微軟正黑體', 20), fg='#FFAAD5').place(x=540, y=85)
-		icon = Image.open('data/image/finish.jpg').resize((50, 50))
-		iconimage = ImageTk.PhotoImage(icon)
+		iconimage = master.assets.photo('finish')
 		self.finish_btn = tk.Button(self, text='Finish', image=iconimage, command=self.stop)
-		self.finish_btn.photo = iconimage
 		self.finish_btn.place(x=1150, y=700)
 
-		self.width, self.height = 950, 500
+		self.width, self.height = self.video_size
 
 		""" video """
 		self.canvas_video = tk.Canvas(self, width=self.width, height=self.height)
 		self.canvas_video.place(x=150, y=150)
-		video_path = VideoPath.Yoga_Video[name]
-		self.player = VideoPlayer(video_path, self.canvas_video)
+		video_path = VideoCache.get_video(VideoPath.Yoga_Video[name], self.video_size)
+		self.player = VideoPlayer(video_path, self.canvas_video, master.scheduler, (self.width, self.height))
 
 		self.start()
 
@@ -36,7 +36,9 @@ class TeachStage(tk.Frame):
 	
 	def stop(self):
 		self.is_running = False
+		# not joined on the Tk thread, the player threads end on their own and a late frame of the destroyed canvas is dropped by the scheduler
 		self.player.stop()
+		self.master.scheduler.forget(self.canvas_video)
 
 		from UI.PlayingSence import StartPlay
 		self.master.switch_frame(StartPlay, name=self.name, vs=self.vs)
\ No newline at end of file
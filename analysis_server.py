@@ -0,0 +1,389 @@
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from tools.VideoPath import Yoga_Model
+
+'''
+Local frame analysis service for thin kiosk clients, standard library asyncio only.
+    POST /analyse?pose=Tree&session=kiosk1[&t=<capture time>]   body: JPEG / PNG bytes
+        -> {"session", "t", "detected", "tips", "tip_code", "roi", "angles", "landmarks", "batch", "latency_ms"}
+    DELETE /session?session=kiosk1   frees the model of a session
+    GET /metrics                     request, batch and latency counters
+Every session has its own YogaPose with its own mediapipe model (the video tracking state follows one camera),
+sessions are pinned to a worker process when they are first seen.
+Requests of a worker are collected for a few milliseconds into a micro-batch that is decoded and analysed
+in one round trip to the worker, connections use HTTP/1.1 keep-alive.
+The load subcommand is a mock kiosk load generator, with --serve it starts the service in the same process.
+
+python analysis_server.py serve --port 8765 --workers 4
+python analysis_server.py load --serve --clients 8 --fps 10 --seconds 20 --video clip.mp4 --pose Tree
+'''
+
+MAX_BODY = 8 * 1024 * 1024
+POSE_TYPES = set(Yoga_Model.values())
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# models of the sessions pinned to this worker process, {session: YogaPose}
+_sessions = {}
+
+def analyseBatch(items):
+    """
+    runs in a worker process
+    items: [(session, pose, image bytes, t)] in arrival order
+    return [result dict], a failing item gets {'error', 'status'} and does not fail the others of the batch
+    """
+    import cv2
+    import yoga_toolkit.toolkit as toolkit
+    from yoga_toolkit.yogaPose import YogaPose
+    from yoga_toolkit.colorSpace import Frame, BGR
+
+    results = []
+    for session, pose_type, data, t in items:
+        try:
+            model = _sessions.get(session)
+            if model is None or model.type != pose_type:
+                model = YogaPose(pose_type)
+                model.pose_model = toolkit.createPoseModel()
+                model.initialDetect()
+                _sessions[session] = model
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                results.append({'session': session, 't': t, 'error': 'image can not be decoded', 'status': 400})
+                continue
+            try:
+                detected = model.analyse(Frame(image, BGR), False)
+            except (ValueError, ZeroDivisionError):
+                detected = False
+            results.append(analyseResult(model, session, t, detected))
+        except Exception as e:
+            _sessions.pop(session, None)
+            results.append({'session': session, 't': t, 'error': f'analyse failed: {e!r}', 'status': 500})
+    return results
+
+def analyseResult(model, session, t, detected):
+    """answer of one frame from the last result of the model"""
+    import yoga_toolkit.toolkit as toolkit
+    import yoga_toolkit.tips as tips
+    return {
+        'session': session,
+        't': t,
+        'detected': detected,
+        'tips': model.tips,
+        'tip_code': tips.tipCode(model.tips),
+        'roi': {name: bool(value) for name, value in model.roi.items()} if detected else {},
+        'angles': {name: float(value) for name, value in model.angle_dict.items()} if detected else {},
+        'landmarks': toolkit.landmarksToArray(model.point2d).round(5).tolist() if detected else None,
+    }
+
+def closeSessions(sessions):
+    for session in sessions:
+        _sessions.pop(session, None)
+    return len(_sessions)
+
+class Worker:
+    '''
+    one worker process and the micro-batch queue in front of it
+    '''
+    def __init__(self, context, max_batch, max_wait):
+        self.context = context
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=context)
+        self.queue = asyncio.Queue()
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.sessions = set()
+
+    async def run(self, service):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, analyseBatch, items)
+            except BrokenProcessPool as e:
+                # the worker process died, its session models are lost and rebuilt on the next request
+                self.restart()
+                results = [{'session': item[0], 't': item[3], 'error': f'worker restarted: {e!r}', 'status': 500} for item in items]
+            except Exception as e:
+                results = [{'session': item[0], 't': item[3], 'error': repr(e), 'status': 500} for item in items]
+            service.metrics['batches'] += 1
+            service.metrics['batched_requests'] += len(batch)
+            for (_, future), result in zip(batch, results):
+                result['batch'] = len(batch)
+                if not future.done():
+                    future.set_result(result)
+
+    def restart(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=self.context)
+
+class AnalysisService:
+    '''
+    workers: worker processes, max_batch: requests per batch, max_wait: seconds a batch waits to fill up
+    session_timeout: seconds after which an idle session is freed
+    '''
+    def __init__(self, workers=2, max_batch=8, max_wait=0.005, session_timeout=60):
+        context = multiprocessing.get_context('spawn')
+        self.workers = [Worker(context, max_batch, max_wait) for _ in range(workers)]
+        self.pinned = {}
+        self.last_seen = {}
+        self.session_timeout = session_timeout
+        self.metrics = {'requests': 0, 'errors': 0, 'batches': 0, 'batched_requests': 0, 'latency_ms': 0.0}
+        self.tasks = []
+
+    def worker(self, session):
+        """worker of a session, a new session goes to the worker with the fewest sessions"""
+        worker = self.pinned.get(session)
+        if worker is None:
+            worker = min(self.workers, key=lambda worker: len(worker.sessions))
+            worker.sessions.add(session)
+            self.pinned[session] = worker
+        self.last_seen[session] = time.monotonic()
+        return worker
+
+    async def analyse(self, session, pose_type, data, t):
+        future = asyncio.get_running_loop().create_future()
+        await self.worker(session).queue.put(((session, pose_type, data, t), future))
+        return await future
+
+    async def close(self, sessions):
+        loop = asyncio.get_running_loop()
+        by_worker = {}
+        for session in sessions:
+            worker = self.pinned.pop(session, None)
+            self.last_seen.pop(session, None)
+            if worker is not None:
+                worker.sessions.discard(session)
+                by_worker.setdefault(worker, []).append(session)
+        for worker, worker_sessions in by_worker.items():
+            try:
+                await loop.run_in_executor(worker.executor, closeSessions, worker_sessions)
+            except BrokenProcessPool:
+                worker.restart()
+
+    async def expire(self):
+        while True:
+            await asyncio.sleep(self.session_timeout / 2)
+            now = time.monotonic()
+            idle = [session for session, seen in self.last_seen.items() if now - seen > self.session_timeout]
+            if idle:
+                await self.close(idle)
+
+    async def handle(self, reader, writer):
+        """one client connection, requests are answered in order (HTTP/1.1 keep-alive)"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ')
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'bad request line'}, False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {'error': 'bad content-length'}, False)
+                    break
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {'error': f'body larger than {MAX_BODY} bytes'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    status, payload = await self.route(method, target, body)
+                except ValueError as e:
+                    status, payload = 400, {'error': str(e)}
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == '/analyse':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            if 'pose' not in query or 'session' not in query or not body:
+                return 400, {'error': 'pose, session and an image body are required'}
+            if query['pose'] not in POSE_TYPES:
+                return 400, {'error': f"unknown pose {query['pose']}, use one of {', '.join(sorted(POSE_TYPES))}"}
+            start = time.perf_counter()
+            self.metrics['requests'] += 1
+            result = await self.analyse(query['session'], query['pose'], body, float(query.get('t', time.time())))
+            self.metrics['latency_ms'] += (time.perf_counter() - start) * 1000
+            if 'error' in result:
+                self.metrics['errors'] += 1
+                return result.pop('status', 500), result
+            result['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            return 200, result
+        if url.path == '/session':
+            if method != 'DELETE':
+                return 405, {'error': 'use DELETE'}
+            await self.close([query.get('session')])
+            return 200, {'closed': query.get('session')}
+        if url.path == '/metrics':
+            metrics = dict(self.metrics)
+            metrics['sessions'] = len(self.pinned)
+            metrics['mean_batch'] = metrics['batched_requests'] / max(metrics['batches'], 1)
+            metrics['mean_latency_ms'] = metrics['latency_ms'] / max(metrics['requests'], 1)
+            return 200, metrics
+        return 404, {'error': f'unknown path {url.path}'}
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def start(self, host, port):
+        self.tasks = [asyncio.create_task(worker.run(self)) for worker in self.workers]
+        self.tasks.append(asyncio.create_task(self.expire()))
+        return await asyncio.start_server(self.handle, host, port)
+
+    def shutdown(self):
+        for task in self.tasks:
+            task.cancel()
+        for worker in self.workers:
+            worker.executor.shutdown(wait=False, cancel_futures=True)
+
+def loadFrames(video_path, count=64, quality=80):
+    """JPEG frames of a video for the mock clients, random noise frames without a video"""
+    import cv2
+    images = []
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        while len(images) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            images.append(frame)
+        cap.release()
+    if not images:
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(4)]
+    return [cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes() for image in images]
+
+async def mockClient(host, port, session, pose_type, frames, fps, end, latency):
+    """one kiosk: posts frames at fps on a keep-alive connection until end, appends round trip seconds to latency"""
+    reader, writer = await asyncio.open_connection(host, port)
+    loop = asyncio.get_running_loop()
+    next_time = loop.time()
+    index = 0
+    try:
+        # at least one request, so end=0 only warms up the session
+        while True:
+            data = frames[index % len(frames)]
+            index += 1
+            start = time.perf_counter()
+            writer.write((f"POST /analyse?pose={pose_type}&session={session}&t={time.time()} HTTP/1.1\r\n"
+                          f"Host: {host}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n\r\n").encode('latin-1') + data)
+            await writer.drain()
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.decode('latin-1').split('\r\n'):
+                name, _, value = line.partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latency.append(time.perf_counter() - start)
+            if loop.time() >= end:
+                break
+            next_time += 1 / fps if fps > 0 else 0
+            await asyncio.sleep(max(0, next_time - loop.time()))
+    finally:
+        writer.close()
+
+async def loadTest(args):
+    service, server = None, None
+    if args.serve:
+        service = AnalysisService(args.workers, args.max_batch, args.max_wait / 1000)
+        server = await service.start(args.host, args.port)
+    frames = loadFrames(args.video)
+    latency = []
+    loop = asyncio.get_running_loop()
+    # the first request of every session pays for the model creation, warm up before measuring
+    await asyncio.gather(*[mockClient(args.host, args.port, f"kiosk{index}", args.pose, frames[:1], 0, 0, [])
+                           for index in range(args.clients)])
+    start = time.perf_counter()
+    end = loop.time() + args.seconds
+    await asyncio.gather(*[mockClient(args.host, args.port, f"kiosk{index}", args.pose, frames, args.fps, end, latency)
+                           for index in range(args.clients)])
+    elapsed = time.perf_counter() - start
+    latency = np.array(latency) * 1000
+    print(f"{args.clients} clients, {len(latency)} frames in {elapsed:.1f} s ({len(latency) / max(elapsed, 1e-9):.1f} fps)")
+    if len(latency):
+        print(f"latency mean {latency.mean():.1f} ms, p50 {np.percentile(latency, 50):.1f} ms, p95 {np.percentile(latency, 95):.1f} ms")
+    if service is not None:
+        _, metrics = await service.route('GET', '/metrics', b'')
+        print(f"{metrics['batches']} batches, mean batch {metrics['mean_batch']:.2f}")
+        server.close()
+        await server.wait_closed()
+        service.shutdown()
+
+async def serve(args):
+    service = AnalysisService(args.workers, args.max_batch, args.max_wait / 1000, args.session_timeout)
+    server = await service.start(args.host, args.port)
+    print(f"analysis service on http://{args.host}:{args.port}, {args.workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="local frame analysis service and mock kiosk load generator")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('serve', 'load'):
+        p = sub.add_parser(name)
+        p.add_argument('--host', default='127.0.0.1')
+        p.add_argument('--port', type=int, default=8765)
+        p.add_argument('--workers', type=int, default=2, help="worker processes")
+        p.add_argument('--max-batch', type=int, default=8, help="requests per micro-batch")
+        p.add_argument('--max-wait', type=float, default=5, help="milliseconds a micro-batch waits to fill up")
+        if name == 'serve':
+            p.add_argument('--session-timeout', type=float, default=60, help="seconds after which an idle session is freed")
+        else:
+            p.add_argument('--serve', action='store_true', help="start the service in this process")
+            p.add_argument('--clients', type=int, default=4)
+            p.add_argument('--fps', type=float, default=10, help="frames per second of each client, 0 as fast as possible")
+            p.add_argument('--seconds', type=float, default=10)
+            p.add_argument('--pose', default='Tree')
+            p.add_argument('--video', help="frames of the clients, random frames without it")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == 'serve' else loadTest(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import os
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+
+'''
+Headless analysis of recorded practice videos.
+Every video is evaluated frame by frame with the pose rules, the per-frame angles, roi flags and tip codes
+are written as columns to <output>/<video>.csv or .npz (and an annotated video with --annotate).
+The videos are spread over a process pool, each worker process loads its own models.
+The landmarks come from landmarkCache, so only the first run of a video pays for the inference.
+
+python batch_analysis.py <video folder> --pose auto --workers 4 --format npz --annotate
+'''
+
+POSE_TYPES = ['WarriorII', 'Tree', 'Plank', 'ReversePlank', 'Childs', 'DownwardDog', 'LowLunge', 'SeatedForwardBend', 'Bridge', 'Pyramid']
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+def findVideos(folder):
+    videos = []
+    for root, _, files in os.walk(folder):
+        for file in sorted(files):
+            if file.lower().endswith(VIDEO_EXTENSIONS):
+                videos.append(os.path.join(root, file))
+    return sorted(videos)
+
+def guessPose(path):
+    """pose type from the folder or file name, e.g. SampleVideo/PyramidPose/sample.mp4 -> Pyramid, None if unknown"""
+    name = path.replace("\\", "/").lower()
+    # longest first, ReversePlank has to win over Plank
+    for pose_type in sorted(POSE_TYPES, key=len, reverse=True):
+        if pose_type.lower() in name:
+            return pose_type
+    return None
+
+def outputName(video_path, folder):
+    relative = os.path.splitext(os.path.relpath(video_path, folder))[0]
+    return relative.replace("\\", "/").replace("/", "__")
+
+_models = {}
+
+def loadModel(pose_type):
+    """one model of each pose per worker process"""
+    from yoga_toolkit.yogaPose import YogaPose
+    if pose_type not in _models:
+        model = YogaPose(pose_type)
+        model.initialDetect()
+        _models[pose_type] = model
+    model = _models[pose_type]
+    model.reset()
+    return model
+
+def analyseVideo(video_path, pose_type, output_path, output_format, annotate):
+    """
+    evaluate one video, runs in a worker process
+    return (video_path, frame count, detected frame count, seconds)
+    """
+    import yoga_toolkit.colorSpace as colorSpace
+    import yoga_toolkit.landmarkCache as landmarkCache
+    import yoga_toolkit.tips as tips
+
+    start = time.perf_counter()
+    model = loadModel(pose_type)
+    angle_names = list(model.angle_def)
+    roi_names = [name for name in model.roi if not name.startswith("MAT_")]
+
+    # inference runs once per video, later runs only read the cached landmarks
+    landmarks, meta = landmarkCache.load(video_path)
+    fps, w, h = meta['fps'], meta['width'], meta['height']
+    cap, writer = None, None
+    if annotate:
+        cap = cv2.VideoCapture(video_path)
+        writer = cv2.VideoWriter(f"{output_path}_annotated.mp4", cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+
+    times, detected, angles, roi, tip_codes = [], [], [], [], []
+    try:
+        for point2d, point3d in landmarkCache.results(landmarks):
+            try:
+                found = model.evaluate(point2d, point3d)
+            except (ValueError, ZeroDivisionError):
+                # degenerate skeleton (zero length limb), counted as not detected
+                found = False
+            times.append(len(times) / fps)
+            detected.append(found)
+            angles.append([model.angle_dict[name] if found else np.nan for name in angle_names])
+            roi.append([bool(model.roi[name]) and found for name in roi_names])
+            tip_codes.append(tips.tipCode(model.tips))
+            if writer is not None:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frame = colorSpace.Frame(frame, colorSpace.BGR).to(colorSpace.RGB)
+                overlay = model.draw(w, h, frame.image, point2d if found else None, mirror=False)
+                writer.write(colorSpace.Frame(overlay, colorSpace.RGB).to(colorSpace.BGR).image)
+    finally:
+        if writer is not None:
+            cap.release()
+            writer.release()
+
+    columns = {
+        'time': np.array(times, dtype=np.float64),
+        'detected': np.array(detected, dtype=bool),
+        'angles': np.array(angles, dtype=np.float32).reshape(len(times), len(angle_names)),
+        'roi': np.array(roi, dtype=bool).reshape(len(times), len(roi_names)),
+        'tip_code': np.array(tip_codes, dtype=np.int16),
+    }
+    if output_format == 'npz':
+        np.savez_compressed(f"{output_path}.npz", pose=pose_type, angle_names=angle_names, roi_names=roi_names,
+                            tips=np.array(tips.allTips()), **columns)
+    else:
+        writeCsv(f"{output_path}.csv", columns, angle_names, roi_names)
+    return video_path, len(times), int(columns['detected'].sum()), time.perf_counter() - start
+
+def writeCsv(path, columns, angle_names, roi_names):
+    """the tip text is written next to the code, the codes alone change meaning when a tip is added"""
+    import yoga_toolkit.tips as tips
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['frame', 'time', 'detected'] + [f"angle_{name}" for name in angle_names]
+                        + [f"roi_{name}" for name in roi_names] + ['tip_code', 'tip'])
+        for index in range(len(columns['time'])):
+            code = int(columns['tip_code'][index])
+            writer.writerow([index, f"{columns['time'][index]:.3f}", int(columns['detected'][index])]
+                            + [f"{angle:.2f}" for angle in columns['angles'][index]]
+                            + [int(flag) for flag in columns['roi'][index]] + [code, tips.tipText(code)])
+
+def main():
+    parser = argparse.ArgumentParser(description="analyse a folder of practice videos without the UI")
+    parser.add_argument('folder', help="folder of videos, searched recursively")
+    parser.add_argument('--pose', default='auto', choices=['auto'] + POSE_TYPES, help="pose type, auto guesses it from the path")
+    parser.add_argument('--output', default='output/analysis', help="output folder")
+    parser.add_argument('--format', default='csv', choices=['csv', 'npz'])
+    parser.add_argument('--annotate', action='store_true', help="also write a video with the wrong joints marked")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+
+    jobs = []
+    for video_path in findVideos(args.folder):
+        pose_type = guessPose(video_path) if args.pose == 'auto' else args.pose
+        if pose_type is None:
+            print(f"skip {video_path}: unknown pose, use --pose")
+            continue
+        jobs.append((video_path, pose_type, os.path.join(args.output, outputName(video_path, args.folder))))
+    if not jobs:
+        print("no video to analyse")
+        return
+    os.makedirs(args.output, exist_ok=True)
+
+    start = time.perf_counter()
+    total_frames = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs)))) as pool:
+        futures = {pool.submit(analyseVideo, video_path, pose_type, output_path, args.format, args.annotate): video_path
+                   for video_path, pose_type, output_path in jobs}
+        for future in as_completed(futures):
+            try:
+                video_path, frames, detected, seconds = future.result()
+            except Exception as e:
+                print(f"{futures[future]} failed: {e}")
+                continue
+            total_frames += frames
+            print(f"{video_path}: {frames} frames, {detected} detected, {frames / max(seconds, 1e-6):.1f} fps")
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs)} videos, {total_frames} frames in {elapsed:.1f} s ({total_frames / max(elapsed, 1e-6):.1f} fps)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import threading
+from PIL import ImageTk
+
+UI_ASSETS = {
+	'background': ('data/image/background.jpg', (1280, 800)),
+	'return': ('data/image/return.jpg', (50, 50)),
+	'finish': ('data/image/finish.jpg', (50, 50)),
+}
+
+class AssetCache:
+	'''
+	Application-wide UI images.
+	The images are decoded and resized once into the shared ImageCache (warm_up runs it on a background thread),
+	PhotoImages are created on first use from the Tk main thread and then reused by every screen.
+	'''
+	def __init__(self, image_cache, assets=UI_ASSETS):
+		self.image_cache = image_cache
+		self.assets = assets
+		self.photos = {}
+
+	def warm_up(self):
+		thread = threading.Thread(target=self.load, daemon=True)
+		thread.start()
+		return thread
+
+	def load(self):
+		for path, size in self.assets.values():
+			self.image_cache.warm([path], size)
+
+	def image(self, name):
+		path, size = self.assets[name]
+		return self.image_cache.get(path, size)
+
+	def photo(self, name):
+		"""main thread only"""
+		if name not in self.photos:
+			self.photos[name] = ImageTk.PhotoImage(self.image(name))
+		return self.photos[name]
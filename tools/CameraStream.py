@@ -1,18 +1,35 @@
 import cv2
 import threading
 import datetime
+import time
+from tools.FrameSource import open_source, NullSource
+from yoga_toolkit.colorSpace import Frame, BGR
 
 class CameraStream:
-	def __init__(self):
-		self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+	'''
+	source: camera index, device path, video file or image directory, see FrameSource.open_source
+	options: width, height, fps, fourcc, buffersize, drop_stale, loop of open_source
+	record: save the original frames to ./output_<time>.avi
+	a source that can not be opened is logged and replaced by a NullSource
+	'''
+	def __init__(self, source=0, record=True, **options):
+		try:
+			self.source = open_source(source, **options)
+		except OSError as e:
+			# no camera is not fatal, the UI runs and simply gets no frames
+			print(f'camera not available: {e}')
+			self.source = NullSource()
 		self.is_running = False
 		self.frame = None
-		
+		self.frame_time = 0
+
 		""" save original frame"""
-		current_date_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-		filename = f"./output_{current_date_time}.avi"
-		self.output = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'XVID'), 30.0, (640, 480))
-		
+		self.output = None
+		if record and self.source.width > 0:
+			current_date_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+			filename = f"./output_{current_date_time}.avi"
+			self.output = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'XVID'), self.source.fps, (self.source.width, self.source.height))
+
 		self.thread = threading.Thread(target=self.update, daemon=True)
 
 	def start(self):
@@ -21,17 +38,23 @@ class CameraStream:
 
 	def update(self):
 		while self.is_running:
-			ret, frame = self.cap.read()
-			self.output.write(frame)
-			if not ret:
+			result = self.source.read()
+			if result is None:
 				break
+			frame, frame_time = result
+			if self.output is not None:
+				self.output.write(frame)
 			try:
-				self.frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+				# kept in BGR, the consumers convert once to the space they need
+				self.frame = Frame(frame, BGR)
+				self.frame_time = frame_time
 			except:
 				print('stop cap stream')
 
-	def stop(self):	
+	def stop(self):
 		self.is_running = False
-		self.cap.release()
-		self.output.release()
-		
\ No newline at end of file
+		self.thread.join(timeout=1)
+		self.source.close()
+		if self.output is not None:
+			self.output.release()
+
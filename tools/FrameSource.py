@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import cv2
+
+'''
+Frame sources of the camera stream: a capture device, a video file or a directory of images.
+Every source returns (BGR frame, time.monotonic() of the capture) from read(), None at the end.
+A device is opened with the backend of the platform (DirectShow on Windows, V4L2 on Linux) and the requested
+resolution, fps, fourcc (MJPG lets USB cameras deliver 720p at 30 fps) and driver buffer size.
+With drop_stale the frames queued in the driver are grabbed without decoding and only the newest one is retrieved,
+so the application works on the current frame instead of one several buffers old.
+Files and image directories stand in for a camera on kiosks without one and in tests, paced at their fps.
+'''
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def default_backend():
+	if sys.platform.startswith('win'):
+		return cv2.CAP_DSHOW
+	if sys.platform.startswith('linux'):
+		return cv2.CAP_V4L2
+	return cv2.CAP_ANY
+
+class FrameSource:
+	width = 0
+	height = 0
+	fps = 0.0
+
+	def read(self):
+		"""(BGR frame, capture time), None when the source has ended"""
+		raise NotImplementedError
+
+	def close(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+class NullSource(FrameSource):
+	"""no camera, read() returns None at once, the application runs without camera frames"""
+	def read(self):
+		return None
+
+class DeviceSource(FrameSource):
+	'''
+	device: index or device path (e.g. /dev/video0)
+	width, height, fps: requested format, None keeps the driver default; the driver may pick the nearest one
+	fourcc: e.g. 'MJPG', None keeps the driver default
+	buffersize: frames queued in the driver, not every backend supports it
+	drop_stale: grab the queued frames and retrieve only the newest one
+	'''
+	max_grabs = 4
+
+	def __init__(self, device=0, width=None, height=None, fps=None, fourcc='MJPG', buffersize=1, drop_stale=True, backend=None):
+		self.device = device
+		self.cap = cv2.VideoCapture(device, default_backend() if backend is None else backend)
+		if not self.cap.isOpened():
+			raise OSError(f'can not open camera {device}')
+		# fourcc first, some drivers only offer the larger resolutions with MJPG
+		if fourcc:
+			self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+		if width:
+			self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+		if height:
+			self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+		if fps:
+			self.cap.set(cv2.CAP_PROP_FPS, fps)
+		if buffersize:
+			self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffersize)
+		self.drop_stale = drop_stale
+		self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+		self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+		self.fps = self.cap.get(cv2.CAP_PROP_FPS) or fps or 30
+		self.dropped = 0
+
+	def read(self):
+		if not self.drop_stale:
+			ret, frame = self.cap.read()
+			return (frame, time.monotonic()) if ret else None
+		# a grab that returns at once took a frame queued in the driver, a new frame makes it wait about a frame interval:
+		# grab again only while the grabs return at once, the first grab that waited holds the newest frame
+		for grabs in range(self.max_grabs + 1):
+			start = time.monotonic()
+			if not self.cap.grab():
+				return None
+			if time.monotonic() - start > 0.5 / self.fps:
+				break
+			if grabs < self.max_grabs:
+				self.dropped += 1
+		t = time.monotonic()
+		ret, frame = self.cap.retrieve()
+		return (frame, t) if ret else None
+
+	def close(self):
+		self.cap.release()
+
+class FileSource(FrameSource):
+	'''
+	video file played as a camera
+	realtime: release the frames at the fps of the file, False -> as fast as they are read
+	loop: restart at the end of the file
+	'''
+	def __init__(self, path, realtime=True, loop=False):
+		self.path = path
+		self.cap = cv2.VideoCapture(path)
+		if not self.cap.isOpened():
+			raise OSError(f'can not open {path}')
+		self.realtime = realtime
+		self.loop = loop
+		self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+		self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+		self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+		self.next_time = None
+
+	def read(self):
+		ret, frame = self.cap.read()
+		if not ret and self.loop:
+			self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+			ret, frame = self.cap.read()
+		if not ret:
+			return None
+		if self.realtime:
+			now = time.monotonic()
+			self.next_time = now if self.next_time is None else self.next_time + 1 / self.fps
+			if self.next_time > now:
+				time.sleep(self.next_time - now)
+		return frame, time.monotonic()
+
+	def close(self):
+		self.cap.release()
+
+class ImageDirSource(FrameSource):
+	'''
+	images of a directory in name order, each shown for 1 / fps seconds
+	'''
+	def __init__(self, folder, fps=30, realtime=True, loop=True):
+		self.paths = sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+		if not self.paths:
+			raise OSError(f'no image in {folder}')
+		self.fps = float(fps)
+		self.realtime = realtime
+		self.loop = loop
+		self.index = 0
+		self.next_time = None
+		first = cv2.imread(self.paths[0])
+		self.height, self.width = first.shape[:2]
+
+	def read(self):
+		if self.index >= len(self.paths):
+			if not self.loop:
+				return None
+			self.index = 0
+		frame = cv2.imread(self.paths[self.index])
+		self.index += 1
+		if frame is None:
+			return self.read()
+		if self.realtime:
+			now = time.monotonic()
+			self.next_time = now if self.next_time is None else self.next_time + 1 / self.fps
+			if self.next_time > now:
+				time.sleep(self.next_time - now)
+		return frame, time.monotonic()
+
+def open_source(spec=0, width=None, height=None, fps=None, fourcc='MJPG', buffersize=1, drop_stale=True, loop=False):
+	"""
+	frame source of spec: a device index ('0', 0) or device path (/dev/video0), an image directory or a video file
+	width, height, fourcc, buffersize, drop_stale apply to devices, fps to devices and image directories, loop to files and directories
+	"""
+	if isinstance(spec, int) or str(spec).isdigit():
+		return DeviceSource(int(spec), width, height, fps, fourcc, buffersize, drop_stale)
+	if str(spec).startswith('/dev/'):
+		return DeviceSource(spec, width, height, fps, fourcc, buffersize, drop_stale)
+	if os.path.isdir(spec):
+		return ImageDirSource(spec, fps or 30, loop=loop)
+	return FileSource(spec, loop=loop)
@@ -0,0 +1,34 @@
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+class ImageCache:
+	'''
+	Bounded LRU cache of decoded, pre-resized PIL images keyed by (path, size).
+	Thread safe, the images can be submitted to the RenderScheduler directly.
+	'''
+	def __init__(self, maxsize=32):
+		self.maxsize = maxsize
+		self.images = OrderedDict()
+		self.lock = threading.Lock()
+
+	def get(self, path, size):
+		key = (path, tuple(size))
+		with self.lock:
+			image = self.images.get(key)
+			if image is not None:
+				self.images.move_to_end(key)
+				return image
+		image = Image.open(path).convert('RGB').resize(key[1])
+		with self.lock:
+			self.images[key] = image
+			while len(self.images) > self.maxsize:
+				self.images.popitem(last=False)
+		return image
+
+	def warm(self, paths, size):
+		for path in paths:
+			try:
+				self.get(path, size)
+			except OSError:
+				print(f'image not found: {path}')
@@ -0,0 +1,70 @@
+import threading
+import time
+from PIL import Image, ImageTk
+from yoga_toolkit.colorSpace import Frame, RGB
+
+class RenderScheduler:
+	'''
+	Draw frames on canvases from the Tk main thread.
+	Worker threads only submit frames, the scheduler keeps the latest frame of each canvas
+	and draws them from an after() loop capped at fps.
+	Each canvas keeps one image item and one PhotoImage, new frames of the same size are pasted into it.
+	'''
+	def __init__(self, root, fps=30):
+		self.root = root
+		self.interval = 1 / fps
+		self.lock = threading.Lock()
+		self.pending = {}
+		self.items = {}
+		self.is_running = False
+
+	def start(self):
+		self.is_running = True
+		self.root.after(0, self.render)
+
+	def stop(self):
+		self.is_running = False
+
+	def submit(self, canvas, frame):
+		"""
+		Thread safe. frame is a colorSpace.Frame, an RGB numpy array or a PIL image, it replaces the frame not drawn yet.
+		A Frame in another space is converted here, on the submitting thread.
+		"""
+		if isinstance(frame, Frame):
+			frame = frame.to(RGB).image
+		with self.lock:
+			self.pending[canvas] = frame
+
+	def forget(self, canvas):
+		with self.lock:
+			self.pending.pop(canvas, None)
+		self.items.pop(canvas, None)
+
+	def render(self):
+		if not self.is_running:
+			return
+		start = time.perf_counter()
+		with self.lock:
+			pending, self.pending = self.pending, {}
+		for canvas, frame in pending.items():
+			if not canvas.winfo_exists():
+				self.items.pop(canvas, None)
+				continue
+			image = frame if isinstance(frame, Image.Image) else Image.fromarray(frame)
+			self.draw(canvas, image)
+		delay = self.interval - (time.perf_counter() - start)
+		self.root.after(max(int(delay * 1000), 1), self.render)
+
+	def draw(self, canvas, image):
+		item = self.items.get(canvas)
+		if item is not None and item[1].width() == image.width and item[1].height() == image.height:
+			item[1].paste(image)
+			return
+		photo_image = ImageTk.PhotoImage(image)
+		if item is None:
+			item_id = canvas.create_image(0, 0, anchor='nw', image=photo_image)
+		else:
+			item_id = item[0]
+			canvas.itemconfigure(item_id, image=photo_image)
+		canvas.image = photo_image
+		self.items[canvas] = (item_id, photo_image)
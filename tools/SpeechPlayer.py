@@ -0,0 +1,113 @@
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+import pygame
+
+class SpeechPlayer:
+	'''
+	Non-blocking text-to-speech.
+	Every text is synthesized once to a wav file in cache_dir and played on its own pygame channel,
+	so it mixes with the background music of MusicPlayer (the music is lowered while speaking).
+	say() only queues: lower priority value plays first, a text already queued or said in the last
+	min_repeat seconds is skipped, interrupt=True stops the current speech.
+	'''
+	def __init__(self, cache_dir='data/voice_cache', rate=150, min_repeat=6, music_volume=0.3, duck_volume=0.1):
+		if not pygame.mixer.get_init():
+			pygame.mixer.init()
+		self.cache_dir = cache_dir
+		self.rate = rate
+		self.min_repeat = min_repeat
+		self.music_volume = music_volume
+		self.duck_volume = duck_volume
+		self.channel = pygame.mixer.Channel(1)
+		self.sounds = {}
+		self.heap = []
+		self.queued = set()
+		self.last_said = {}
+		self.prerender_texts = []
+		self.counter = itertools.count()
+		self.cond = threading.Condition()
+		self.engine = None
+		self.ducked = False
+		self.is_running = False
+
+		self.thread = threading.Thread(target=self.update, daemon=True)
+
+	def start(self):
+		self.is_running = True
+		self.thread.start()
+
+	def clip_path(self, text):
+		digest = hashlib.sha1(f'{self.rate}:{text}'.encode('utf-8')).hexdigest()
+		return f'{self.cache_dir}/{digest}.wav'
+
+	def prerender(self, texts):
+		"""synthesize texts into the cache while the player is idle"""
+		with self.cond:
+			self.prerender_texts += [text for text in texts if not os.path.exists(self.clip_path(text))]
+			self.cond.notify()
+
+	def say(self, text, priority=1, interrupt=False):
+		if not text:
+			return
+		with self.cond:
+			if text in self.queued or time.monotonic() - self.last_said.get(text, -self.min_repeat) < self.min_repeat:
+				return
+			self.queued.add(text)
+			heapq.heappush(self.heap, (priority, next(self.counter), text, interrupt))
+			self.cond.notify()
+
+	def render(self, text):
+		"""path of the clip of text, synthesized on the player thread (pyttsx3 is not thread safe)"""
+		path = self.clip_path(text)
+		if not os.path.exists(path):
+			if self.engine is None:
+				# imported here, the engine start-up is paid on the player thread instead of at application start
+				import pyttsx3
+				self.engine = pyttsx3.init()
+				self.engine.setProperty('rate', self.rate)
+			os.makedirs(self.cache_dir, exist_ok=True)
+			self.engine.save_to_file(text, path)
+			self.engine.runAndWait()
+		return path
+
+	def play(self, text):
+		if text not in self.sounds:
+			self.sounds[text] = pygame.mixer.Sound(self.render(text))
+		pygame.mixer.music.set_volume(self.duck_volume)
+		self.ducked = True
+		self.channel.play(self.sounds[text])
+
+	def update(self):
+		while self.is_running:
+			text, prerender = None, None
+			with self.cond:
+				busy = self.channel.get_busy()
+				if self.ducked and not busy:
+					pygame.mixer.music.set_volume(self.music_volume)
+					self.ducked = False
+				if self.heap and (not busy or self.heap[0][3]):
+					_, _, text, interrupt = heapq.heappop(self.heap)
+					self.queued.discard(text)
+					self.last_said[text] = time.monotonic()
+				elif self.prerender_texts:
+					prerender = self.prerender_texts.pop(0)
+				else:
+					self.cond.wait(0.05)
+					continue
+			try:
+				if text is not None:
+					if interrupt:
+						self.channel.stop()
+					self.play(text)
+				else:
+					self.render(prerender)
+			except (RuntimeError, OSError, pygame.error) as e:
+				print(f'speech error: {e}')
+
+	def stop(self):
+		self.is_running = False
+		self.channel.stop()
@@ -0,0 +1,331 @@
+import os
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from collections import deque, namedtuple
+import numpy as np
+from tools.FrameSource import open_source
+
+'''
+Run several camera / mat stations on one host.
+Every station has its own camera capture thread, its own yoga mat reader (optional) and its own YogaPose
+with its own mediapipe model, so the video tracking state of one station never sees the frames of another.
+Inference runs in worker processes, each station is pinned to one worker for its whole life (the tracking state
+lives there) and the stations are spread over the workers by their fps targets.
+A dispatcher thread per worker keeps one frame in flight and picks the next station by earliest deadline first:
+a station is released every 1 / fps seconds and its deadline is the next release, stale frames are skipped.
+Since the inference of each worker is independent, adding stations scales with the workers until the cores run out.
+
+python -m tools.StationManager --station Tree,0 --station Plank,clip.mp4,10 --station WarriorII,1,15,COM4 --workers 2
+'''
+
+# latest result of a station, landmarks: (33, 4) image landmarks or None, t: capture time
+StationResult = namedtuple('StationResult', ['t', 'detected', 'tips', 'roi', 'angles', 'landmarks'])
+
+class Station:
+	'''
+	pose_type: pose of the station
+	camera: device index, device path, video file or image directory (FrameSource.open_source), files are looped
+	fps: target analysed frames per second
+	mat_port: serial port of the yoga mat, None -> no pressure rule
+	'''
+	def __init__(self, station_id, pose_type, camera=0, fps=15.0, mat_port=None):
+		self.id = station_id
+		self.pose_type = pose_type
+		self.camera = camera
+		self.fps = float(fps)
+		self.period = 1 / self.fps
+		self.mat_port = mat_port
+		self.frame = None
+		self.frame_time = 0
+		self.sent_time = 0
+		self.next_release = 0
+		self.result = None
+		self.metrics = StationMetrics()
+
+	def deadline(self):
+		return self.next_release + self.period
+
+class StationMetrics:
+	def __init__(self, window=128):
+		self.captured = 0
+		self.processed = 0
+		self.skipped = 0
+		self.deadline_misses = 0
+		self.latency = deque(maxlen=window)
+		self.inference = deque(maxlen=window)
+		self.done_times = deque(maxlen=window)
+
+	def summary(self):
+		"""achieved fps, latency from capture to result and inference time in ms over the last window"""
+		fps = 0.0
+		if len(self.done_times) > 1:
+			fps = (len(self.done_times) - 1) / max(self.done_times[-1] - self.done_times[0], 1e-9)
+		latency = np.array(self.latency) * 1000
+		inference = np.array(self.inference) * 1000
+		return {
+			'fps': fps,
+			'captured': self.captured,
+			'processed': self.processed,
+			'skipped': self.skipped,
+			'deadline_misses': self.deadline_misses,
+			'latency_ms': float(latency.mean()) if len(latency) else 0.0,
+			'latency_p95_ms': float(np.percentile(latency, 95)) if len(latency) else 0.0,
+			'inference_ms': float(inference.mean()) if len(inference) else 0.0,
+		}
+
+def station_worker(stations, inbox, outbox):
+	"""
+	inference process, stations: {station_id: pose_type} pinned to this worker
+	jobs (station_id, t, BGR frame, MatFeature or None) -> results (station_id, t, StationResult, inference seconds)
+	"""
+	import yoga_toolkit.toolkit as toolkit
+	from yoga_toolkit.yogaPose import YogaPose
+	from yoga_toolkit.colorSpace import Frame, BGR
+
+	models = {}
+	for station_id, pose_type in stations.items():
+		model = YogaPose(pose_type)
+		model.pose_model = toolkit.createPoseModel()
+		model.initialDetect()
+		models[station_id] = model
+	outbox.put(('ready', os.getpid()))
+	while True:
+		job = inbox.get()
+		if job is None:
+			break
+		station_id, t, image, mat_feature = job
+		model = models[station_id]
+		start = time.perf_counter()
+		try:
+			detected = model.analyse(Frame(image, BGR), False, mat_feature)
+			landmarks = toolkit.landmarksToArray(model.point2d) if detected else None
+		except Exception as e:
+			# a failing frame must not end the worker and every station pinned to it
+			if not isinstance(e, (ValueError, ZeroDivisionError)):
+				print(f'station {station_id}: analyse error: {e!r}')
+			detected, landmarks = False, None
+		result = StationResult(t, detected, model.tips, dict(model.roi), dict(model.angle_dict), landmarks)
+		outbox.put((station_id, t, result, time.perf_counter() - start))
+
+def pin_stations(stations, workers):
+	"""[[station]] per worker, largest fps first onto the least loaded worker"""
+	groups = [[] for _ in range(workers)]
+	loads = [0.0] * workers
+	for station in sorted(stations, key=lambda station: station.fps, reverse=True):
+		worker = loads.index(min(loads))
+		groups[worker].append(station)
+		loads[worker] += station.fps
+	return [group for group in groups if group]
+
+class StationManager:
+	'''
+	stations: list of Station, workers: inference processes (default: one per core, at most one per station)
+	on_result: optional callback(station, StationResult), called from the dispatcher threads
+	'''
+	def __init__(self, stations, workers=None, on_result=None):
+		if len({station.id for station in stations}) != len(stations):
+			raise ValueError('station ids have to be unique')
+		self.stations = {station.id: station for station in stations}
+		workers = min(workers or os.cpu_count() or 1, len(stations))
+		self.groups = pin_stations(stations, workers)
+		self.on_result = on_result
+		self.context = multiprocessing.get_context('spawn')
+		self.lock = threading.Lock()
+		self.threads = []
+		self.processes = []
+		self.mats = {}
+		self.is_running = False
+
+	def start(self):
+		self.is_running = True
+		for station in self.stations.values():
+			self.threads.append(threading.Thread(target=self.capture, args=(station,), daemon=True))
+			if station.mat_port is not None:
+				from yoga_toolkit.yogamat import YogaMat
+				self.mats[station.id] = YogaMat(station.mat_port)
+				self.threads.append(threading.Thread(target=self.read_mat, args=(self.mats[station.id],), daemon=True))
+		for index, group in enumerate(self.groups):
+			self.processes.append(self.start_worker(group))
+			self.threads.append(threading.Thread(target=self.dispatch, args=(index, group), daemon=True))
+		for thread in self.threads:
+			thread.start()
+
+	def start_worker(self, group):
+		"""(process, inbox, outbox) of a new worker for the stations of group"""
+		inbox, outbox = self.context.Queue(maxsize=2), self.context.Queue()
+		process = self.context.Process(target=station_worker, args=({station.id: station.pose_type for station in group}, inbox, outbox), daemon=True)
+		process.start()
+		return process, inbox, outbox
+
+	def restart_worker(self, index, group):
+		process, _, _ = self.processes[index]
+		print(f'worker {process.pid} died (exit code {process.exitcode}), restarting')
+		self.processes[index] = self.start_worker(group)
+
+	def wait_ready(self, index, group):
+		"""wait for the ready message of worker index, restart it if it dies first, False if stopped meanwhile"""
+		while self.is_running:
+			process, _, outbox = self.processes[index]
+			try:
+				outbox.get(timeout=1)
+				return True
+			except queue.Empty:
+				if not process.is_alive():
+					self.restart_worker(index, group)
+		return False
+
+	def capture(self, station):
+		# a video file or image directory stands in for a camera, played at its own fps and looped
+		try:
+			source = open_source(station.camera, loop=True)
+		except OSError as e:
+			print(f'station {station.id}: camera not available: {e}')
+			return
+		try:
+			while self.is_running:
+				result = source.read()
+				if result is None:
+					print(f'station {station.id}: camera {station.camera} stopped')
+					break
+				frame, frame_time = result
+				with self.lock:
+					if station.frame is not None and station.frame_time > station.sent_time:
+						station.metrics.skipped += 1
+					station.frame, station.frame_time = frame, frame_time
+					station.metrics.captured += 1
+		finally:
+			source.close()
+
+	def read_mat(self, mat):
+		while self.is_running:
+			if mat.read() is None:
+				time.sleep(0.1)
+
+	def next_job(self, group, now):
+		"""
+		the released station with a new frame and the earliest deadline, and the time to wait if there is none
+		job: (station, frame, frame time, deadline), the deadline is the next release as it was before this job moved it
+		"""
+		best, wait = None, 0.05
+		with self.lock:
+			for station in group:
+				if station.frame is None or station.frame_time <= station.sent_time:
+					wait = min(wait, 0.002)
+					continue
+				if station.next_release > now:
+					wait = min(wait, station.next_release - now)
+					continue
+				if best is None or station.deadline() < best.deadline():
+					best = station
+			if best is None:
+				return None, wait
+			frame, frame_time = best.frame, best.frame_time
+			deadline = best.deadline()
+			best.sent_time = frame_time
+			# released once per period, periods lost to an overload are dropped instead of run in a burst
+			best.next_release = max(best.next_release + best.period, now - best.period)
+		return (best, frame, frame_time, deadline), 0
+
+	def dispatch(self, index, group):
+		if not self.wait_ready(index, group):
+			return
+		now = time.monotonic()
+		for station in group:
+			station.next_release = now
+		while self.is_running:
+			process, inbox, outbox = self.processes[index]
+			now = time.monotonic()
+			job, wait = self.next_job(group, now)
+			if job is None:
+				time.sleep(wait)
+				continue
+			station, frame, frame_time, deadline = job
+			mat = self.mats.get(station.id)
+			try:
+				inbox.put((station.id, frame_time, frame, mat.feature_at(frame_time) if mat is not None else None), timeout=10)
+				reply = self.wait_reply(outbox, (station.id, frame_time))
+			except (queue.Full, queue.Empty):
+				if process.is_alive():
+					print(f'station {station.id}: worker not responding')
+					continue
+				# the tracking state of the stations is lost with the worker, the new one starts them afresh
+				self.restart_worker(index, group)
+				if not self.wait_ready(index, group):
+					return
+				continue
+			_, _, result, inference = reply
+			done = time.monotonic()
+			metrics = station.metrics
+			metrics.processed += 1
+			metrics.latency.append(done - frame_time)
+			metrics.inference.append(inference)
+			metrics.done_times.append(done)
+			if done > deadline:
+				metrics.deadline_misses += 1
+			station.result = result
+			if self.on_result is not None:
+				self.on_result(station, result)
+
+	def wait_reply(self, outbox, key, timeout=10):
+		"""reply of the job key (station_id, t), late replies of jobs that timed out before are dropped"""
+		end = time.monotonic() + timeout
+		while True:
+			reply = outbox.get(timeout=max(0, end - time.monotonic()))
+			if (reply[0], reply[1]) == key:
+				return reply
+
+	def result(self, station_id):
+		return self.stations[station_id].result
+
+	def metrics(self):
+		return {station_id: station.metrics.summary() for station_id, station in self.stations.items()}
+
+	def stop(self):
+		self.is_running = False
+		for thread in self.threads:
+			thread.join(timeout=2)
+		for process, inbox, _ in self.processes:
+			try:
+				inbox.put(None, timeout=1)
+			except queue.Full:
+				pass
+			process.join(timeout=5)
+			if process.is_alive():
+				process.terminate()
+		for mat in self.mats.values():
+			mat.close()
+
+def parse_station(station_id, text, fps):
+	"""'pose,camera[,fps[,mat port]]' -> Station, a numeric camera is a device index"""
+	parts = text.split(',')
+	if len(parts) < 2:
+		raise ValueError(f'station has to be pose,camera[,fps[,mat port]], got {text}')
+	camera = int(parts[1]) if parts[1].isdigit() else parts[1]
+	station_fps = float(parts[2]) if len(parts) > 2 and parts[2] else fps
+	mat_port = parts[3] if len(parts) > 3 else None
+	return Station(station_id, parts[0], camera, station_fps, mat_port)
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='run several camera / mat stations with shared inference workers')
+	parser.add_argument('--station', action='append', required=True, help='pose,camera[,fps[,mat port]], e.g. Tree,0 or Plank,clip.mp4,10')
+	parser.add_argument('--workers', type=int, help='inference processes, default one per core')
+	parser.add_argument('--fps', type=float, default=15, help='default fps target of a station')
+	parser.add_argument('--seconds', type=float, default=30, help='run time, metrics are printed every 5 seconds')
+	args = parser.parse_args()
+
+	manager = StationManager([parse_station(index, text, args.fps) for index, text in enumerate(args.station)], args.workers)
+	manager.start()
+	try:
+		end = time.monotonic() + args.seconds
+		while time.monotonic() < end:
+			time.sleep(min(5, max(0, end - time.monotonic())))
+			for station_id, summary in manager.metrics().items():
+				station = manager.stations[station_id]
+				print(f'station {station_id} {station.pose_type}: {summary["fps"]:.1f}/{station.fps:.0f} fps, '
+					f'latency {summary["latency_ms"]:.0f} ms (p95 {summary["latency_p95_ms"]:.0f}), inference {summary["inference_ms"]:.0f} ms, '
+					f'skipped {summary["skipped"]}, deadline misses {summary["deadline_misses"]}')
+	finally:
+		manager.stop()
@@ -0,0 +1,127 @@
+import cv2
+import hashlib
+import json
+import os
+import threading
+
+'''
+Display-sized copies of the teaching videos, keyed by source content hash and target size.
+Build them at install time with `python -m tools.VideoCache`, otherwise they are built
+in the background the first time a video is played and used from the next playback on.
+'''
+
+CACHE_DIR = 'data/video/cache'
+INDEX_PATH = f'{CACHE_DIR}/index.json'
+lock = threading.Lock()
+jobs = {}
+
+def file_hash(path):
+	sha = hashlib.sha1()
+	with open(path, 'rb') as file:
+		for chunk in iter(lambda: file.read(1 << 20), b''):
+			sha.update(chunk)
+	return sha.hexdigest()
+
+def read_index():
+	try:
+		with open(INDEX_PATH, 'r') as file:
+			return json.load(file)
+	except (OSError, ValueError):
+		return {}
+
+def source_hash(video_path, compute=True):
+	"""
+	content hash of video_path, remembered in the index as long as the file size and mtime are unchanged
+	compute: False -> return None instead of hashing an unknown file
+	"""
+	stat = os.stat(video_path)
+	with lock:
+		entry = read_index().get(video_path)
+	if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+		return entry['hash']
+	if not compute:
+		return None
+	digest = file_hash(video_path)
+	with lock:
+		index = read_index()
+		index[video_path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest}
+		os.makedirs(CACHE_DIR, exist_ok=True)
+		# other processes (the CLI, another App) read the index too, replace it in one step
+		tmp_path = f'{INDEX_PATH}.{os.getpid()}.tmp'
+		with open(tmp_path, 'w') as file:
+			json.dump(index, file, indent=4)
+		os.replace(tmp_path, INDEX_PATH)
+	return digest
+
+def cache_path(digest, size):
+	return f'{CACHE_DIR}/{digest[:16]}_{size[0]}x{size[1]}.mp4'
+
+def transcode(video_path, size, output_path):
+	"""
+	write a resized copy of video_path to output_path, raise OSError if the source can not be read or the copy not written
+	the copy is written under a temporary name and only renamed when it is complete, a failed copy is never cached
+	"""
+	cap = cv2.VideoCapture(video_path)
+	if not cap.isOpened():
+		raise OSError(f'can not open {video_path}')
+	fps = cap.get(cv2.CAP_PROP_FPS) or 30
+	tmp_path = output_path + '.tmp.mp4'
+	output = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+	frames = 0
+	try:
+		if not output.isOpened():
+			raise OSError(f'can not write {tmp_path}')
+		while True:
+			ret, frame = cap.read()
+			if not ret:
+				break
+			output.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+			frames += 1
+		if frames == 0:
+			raise OSError(f'no frame read from {video_path}')
+	except BaseException:
+		cap.release()
+		output.release()
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+		raise
+	cap.release()
+	output.release()
+	os.replace(tmp_path, output_path)
+
+def build(video_path, size):
+	"""transcode video_path to size if it is not cached yet, return the cached path"""
+	path = cache_path(source_hash(video_path), size)
+	if not os.path.exists(path):
+		os.makedirs(CACHE_DIR, exist_ok=True)
+		transcode(video_path, size, path)
+	return path
+
+def get_video(video_path, size):
+	"""
+	path of the display-sized video if it is cached, otherwise start building it in the background
+	and return video_path
+	"""
+	if not os.path.exists(video_path):
+		return video_path
+	digest = source_hash(video_path, compute=False)
+	if digest is not None and os.path.exists(cache_path(digest, size)):
+		return cache_path(digest, size)
+	key = (video_path, tuple(size))
+	with lock:
+		if key not in jobs:
+			jobs[key] = threading.Thread(target=build, args=(video_path, tuple(size)), daemon=True)
+			jobs[key].start()
+	return video_path
+
+if __name__ == '__main__':
+	import tools.VideoPath as VideoPath
+	from UI.TeachStage import TeachStage
+	for name, video_path in VideoPath.Yoga_Video.items():
+		if os.path.exists(video_path):
+			try:
+				print(f'{name}: {build(video_path, TeachStage.video_size)}')
+			except OSError as e:
+				print(f'{name}: {e}')
+		else:
+			print(f'{name}: {video_path} not found')
@@ -1,42 +1,82 @@
 import cv2
+import queue
 import threading
-from PIL import Image, ImageTk
 import time
+from yoga_toolkit.colorSpace import Frame, BGR, RGB
 
 class VideoPlayer:
-	def __init__(self, video_path, canvas):
+	'''
+	Decode-ahead video player.
+	The decode thread reads, scales to size and converts the frames into a bounded queue,
+	the play thread paces them against a monotonic clock and drops frames when it falls behind.
+	'''
+	def __init__(self, video_path, canvas, scheduler, size, queue_size=8):
 		self.canvas = canvas
+		self.scheduler = scheduler
+		self.size = size
 		self.video = cv2.VideoCapture(video_path)
-		self.fps = self.video.get(cv2.CAP_PROP_FPS)
+		self.fps = self.video.get(cv2.CAP_PROP_FPS) or 30
 		self.is_playing = False
+		self.frames = queue.Queue(maxsize=queue_size)
+		self.dropped = 0
 
+		self.decode_thread = threading.Thread(target=self.decode, daemon=True)
 		self.video_thread = threading.Thread(target=self.update, daemon=True)
 
 	def start(self):
 		self.is_playing = True
+		self.decode_thread.start()
 		self.video_thread.start()
 
-	def update(self):
-		while self.is_playing:
-			init_t = time.time()
+	def decode(self):
+		rewound = False
+		while self.is_playing and self.video.isOpened():
 			ret, frame = self.video.read()
 			if not ret:
-				self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)				
-			else:
-				try:
-					self.is_delay = False
-					frame = cv2.resize(frame, (self.canvas.winfo_width(), self.canvas.winfo_height()))
-					frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-					photo_image = ImageTk.PhotoImage(Image.fromarray(frame))
-					self.canvas.create_image(0, 0, anchor='nw', image=photo_image)
-					self.canvas.image = photo_image
-					self.canvas.update()
-				except:
+				if rewound:
 					print('stop video stream')
+					break
+				self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+				rewound = True
+				continue
+			rewound = False
+			if (frame.shape[1], frame.shape[0]) != self.size:
+				frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+			frame = Frame(frame, BGR).to(RGB)
+			while self.is_playing:
+				try:
+					self.frames.put(frame, timeout=0.1)
+					break
+				except queue.Full:
+					pass
+		self.video.release()
+
+	def update(self):
+		interval = 1 / self.fps
+		start = time.monotonic()
+		count = 0
+		while self.is_playing:
+			try:
+				frame = self.frames.get(timeout=0.1)
+			except queue.Empty:
+				continue
+			target = start + count * interval
+			count += 1
+			late = time.monotonic() - target
+			if late > 0.5:
+				# stalled (e.g. decoder starved), restart the clock instead of dropping a burst of frames
+				start = time.monotonic() - (count - 1) * interval
+			elif late > interval:
+				self.dropped += 1
+				continue
+			elif late < 0:
+				time.sleep(-late)
+			self.scheduler.submit(self.canvas, frame)
 
-				self.delay = 1/self.fps - (time.time()-init_t)
-				time.sleep(self.delay if self.delay > 0 else 0)
-	
 	def stop(self):
 		self.is_playing = False
-		self.video.release()
+
+	def join(self, timeout=2):
+		for thread in (self.decode_thread, self.video_thread):
+			if thread.ident is not None:
+				thread.join(timeout)
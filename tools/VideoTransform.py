@@ -0,0 +1,257 @@
+import os
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import cv2
+
+'''
+Pipelined video transform, e.g. to prepare the sample videos of yoga_toolkit/SampleVideo.
+Decode, transform and encode run on their own threads joined by bounded queues.
+The transform is a chain of operations, the output size and fps are derived from the chain:
+	rotate:90|180|270 (clockwise), flip:h|v|hv, crop:x,y,w,h, resize:w,h (-1 keeps the aspect ratio), fps:n
+
+python -m tools.VideoTransform in.mp4 other.mp4 --output out --op flip:h --op rotate:90 --op resize:-1,720
+'''
+
+class Rotate:
+	CODES = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+
+	def __init__(self, angle):
+		if int(angle) % 360 not in (0, 90, 180, 270):
+			raise ValueError(f'rotate angle has to be a multiple of 90, got {angle}')
+		self.angle = int(angle) % 360
+
+	def size(self, size):
+		return (size[1], size[0]) if self.angle in (90, 270) else size
+
+	def apply(self, frame, size):
+		return cv2.rotate(frame, self.CODES[self.angle]) if self.angle else frame
+
+class Flip:
+	CODES = {'h': 1, 'v': 0, 'hv': -1}
+
+	def __init__(self, axis='h'):
+		if axis not in self.CODES:
+			raise ValueError(f'flip axis has to be h, v or hv, got {axis}')
+		self.code = self.CODES[axis]
+
+	def size(self, size):
+		return size
+
+	def apply(self, frame, size):
+		return cv2.flip(frame, self.code)
+
+class Crop:
+	def __init__(self, x, y, w, h):
+		self.x, self.y, self.w, self.h = int(x), int(y), int(w), int(h)
+
+	def size(self, size):
+		if self.x < 0 or self.y < 0 or self.x + self.w > size[0] or self.y + self.h > size[1]:
+			raise ValueError(f'crop {self.x},{self.y},{self.w},{self.h} is outside of a {size[0]}x{size[1]} frame')
+		return (self.w, self.h)
+
+	def apply(self, frame, size):
+		return frame[self.y:self.y + self.h, self.x:self.x + self.w]
+
+class Resize:
+	def __init__(self, w, h):
+		self.w, self.h = int(w), int(h)
+
+	def size(self, size):
+		w, h = self.w, self.h
+		if w < 0 and h < 0:
+			w, h = size
+		elif w < 0:
+			w = round(size[0] * h / size[1])
+		elif h < 0:
+			h = round(size[1] * w / size[0])
+		return (w, h)
+
+	def apply(self, frame, size):
+		target = self.size(size)
+		if target == size:
+			return frame
+		return cv2.resize(frame, target, interpolation=cv2.INTER_AREA)
+
+class Fps:
+	"""changes the output frame rate, frames are dropped or repeated before the transform"""
+	def __init__(self, fps):
+		self.fps = float(fps)
+
+	def size(self, size):
+		return size
+
+	def apply(self, frame, size):
+		return frame
+
+OPERATIONS = {'rotate': Rotate, 'flip': Flip, 'crop': Crop, 'resize': Resize, 'fps': Fps}
+
+def parse_op(text):
+	"""'rotate:90' -> Rotate(90)"""
+	name, _, args = text.partition(':')
+	if name not in OPERATIONS:
+		raise ValueError(f'unknown operation {name}, use one of {", ".join(OPERATIONS)}')
+	return OPERATIONS[name](*[arg for arg in args.split(',') if arg])
+
+def output_format(ops, size, fps):
+	"""size and fps of the output of the chain for an input of size and fps"""
+	for op in ops:
+		size = op.size(size)
+		if isinstance(op, Fps):
+			fps = op.fps
+	return size, fps
+
+class VideoTransform:
+	'''
+	Transform one video file with a chain of operations.
+	run() blocks until the output is written, the decode / transform / encode threads overlap the work.
+	'''
+	def __init__(self, input_path, output_path, ops, queue_size=16, fourcc='mp4v'):
+		self.input_path = input_path
+		self.output_path = output_path
+		self.video = cv2.VideoCapture(input_path)
+		if not self.video.isOpened():
+			raise OSError(f'can not open {input_path}')
+		self.input_fps = self.video.get(cv2.CAP_PROP_FPS) or 30
+		input_size = (int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+		self.size, self.fps = output_format(ops, input_size, self.input_fps)
+		# (operation, input size of the operation), the ops stay stateless and can be shared by parallel jobs
+		self.steps = []
+		for op in ops:
+			if not isinstance(op, Fps):
+				self.steps.append((op, input_size))
+			input_size = op.size(input_size)
+		self.fourcc = fourcc
+		self.decoded = queue.Queue(maxsize=queue_size)
+		self.transformed = queue.Queue(maxsize=queue_size)
+		self.frames = 0
+		self.error = None
+		self.is_running = False
+
+	def put(self, frames, item):
+		while self.is_running:
+			try:
+				frames.put(item, timeout=0.1)
+				return
+			except queue.Full:
+				pass
+
+	def get(self, frames):
+		while self.is_running:
+			try:
+				return frames.get(timeout=0.1)
+			except queue.Empty:
+				pass
+		return None
+
+	def decode(self):
+		try:
+			index = 0
+			while self.is_running:
+				ret, frame = self.video.read()
+				if not ret:
+					break
+				# number of output frames of this input frame at the output fps, 0 drops it
+				repeat = int((index + 1) * self.fps / self.input_fps) - int(index * self.fps / self.input_fps)
+				index += 1
+				for _ in range(repeat):
+					self.put(self.decoded, frame)
+		except Exception as e:
+			self.fail(e)
+		finally:
+			self.video.release()
+			self.put(self.decoded, None)
+
+	def transform(self):
+		try:
+			while self.is_running:
+				frame = self.get(self.decoded)
+				if frame is None:
+					break
+				for op, size in self.steps:
+					frame = op.apply(frame, size)
+				self.put(self.transformed, frame)
+		except Exception as e:
+			self.fail(e)
+		finally:
+			self.put(self.transformed, None)
+
+	def encode(self):
+		tmp_path = self.output_path + '.tmp' + os.path.splitext(self.output_path)[1]
+		output = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self.size)
+		if not output.isOpened():
+			# e.g. a fourcc the platform can not encode, an unwritable folder or an odd frame size
+			self.fail(OSError(f'can not write {self.output_path} with {self.fourcc} at {self.size[0]}x{self.size[1]}'))
+			output.release()
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+			return
+		try:
+			while self.is_running:
+				frame = self.get(self.transformed)
+				if frame is None:
+					break
+				output.write(frame)
+				self.frames += 1
+		except Exception as e:
+			self.fail(e)
+		finally:
+			output.release()
+		if self.error is None:
+			os.replace(tmp_path, self.output_path)
+		elif os.path.exists(tmp_path):
+			os.remove(tmp_path)
+
+	def fail(self, error):
+		if self.error is None:
+			self.error = error
+		self.is_running = False
+
+	def run(self):
+		"""transform the whole video, return the number of written frames"""
+		self.is_running = True
+		threads = [threading.Thread(target=stage, daemon=True) for stage in (self.decode, self.transform, self.encode)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.is_running = False
+		if self.error is not None:
+			raise self.error
+		return self.frames
+
+def transform_video(input_path, output_path, ops):
+	return VideoTransform(input_path, output_path, ops).run()
+
+def transform_all(jobs, ops, workers=None):
+	"""
+	run (input_path, output_path) jobs with the same chain in parallel, OpenCV releases the GIL while decoding and encoding
+	yields (input_path, frames or the exception)
+	"""
+	with ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1)) as pool:
+		futures = {pool.submit(transform_video, input_path, output_path, ops): input_path for input_path, output_path in jobs}
+		for future in as_completed(futures):
+			try:
+				yield futures[future], future.result()
+			except Exception as e:
+				yield futures[future], e
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='transform videos with a chain of operations')
+	parser.add_argument('inputs', nargs='+', help='video files')
+	parser.add_argument('--output', required=True, help='output folder')
+	parser.add_argument('--op', action='append', default=[], help='operation, in order, e.g. rotate:90 flip:h crop:0,0,640,480 resize:-1,720 fps:15')
+	parser.add_argument('--workers', type=int, help='videos transformed at the same time')
+	args = parser.parse_args()
+
+	ops = [parse_op(text) for text in args.op]
+	# the outputs keep the paths relative to the common folder of the inputs, so a.mp4 of two folders do not overwrite each other
+	base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in args.inputs])
+	jobs = [(path, os.path.join(args.output, os.path.relpath(os.path.abspath(path), base))) for path in args.inputs]
+	if len({output_path for _, output_path in jobs}) != len(jobs):
+		parser.error('an input is given twice')
+	for _, output_path in jobs:
+		os.makedirs(os.path.dirname(output_path), exist_ok=True)
+	for path, result in transform_all(jobs, ops, args.workers):
+		print(f'{path}: {result if isinstance(result, Exception) else f"{result} frames"}')
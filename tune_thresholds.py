@@ -0,0 +1,212 @@
+import csv
+import time
+import argparse
+from collections import defaultdict
+import numpy as np
+
+'''
+Tune the angle thresholds of the pose rules (yoga_toolkit/thresholds.py) on labelled videos.
+The labels are a csv with the columns video, pose, start, end, joint, correct:
+frames [start, end) of the video have the joint (an angle of AngleNodeDef, * for all of them) correct (1) or wrong (0),
+an empty end means to the end of the video, later rows override earlier ones.
+The landmarks come from landmarkCache, the angles of all frames are computed at once,
+and every grid value of a threshold (the product of the grids when a name has a min and a max)
+is evaluated against all labelled frames in one broadcast.
+The landmark offsets of thresholds.OFFSETS are tuned the same way on the labels of their joint,
+the other thresholds of the joint are applied at their current values while one of them is swept.
+A joint the rule marks wrong counts as positive, precision and recall are reported for the default and the best value.
+
+python tune_thresholds.py labels.csv --pose Tree --write
+'''
+
+# angles measured in the x-y plane, as in YogaPose.evaluate
+PLANAR_POSES = ('ReversePlank', 'Plank', 'Childs')
+GRIDS = {
+    'min': (0, 180),
+    'max': (0, 180),
+    'tolerance': (0, 45),
+    'lower_tolerance': (0, 45),
+    'upper_tolerance': (0, 45),
+}
+# landmark offsets in cm
+OFFSET_GRID = (0, 50)
+
+def poseAngles(landmarks, angle_def, planar):
+    """
+    angles of angle_def for every frame at once, the vectorized toolkit.computeAngle on the world landmarks
+    landmarks: (frames, 2, 33, 4) array of landmarkCache
+    return (frames, len(angle_def)) float array in degrees, NaN for frames without a skeleton
+    """
+    points = np.asarray(landmarks[:, 1, :, :2] if planar else landmarks[:, 1, :, :3], dtype=np.float64)
+    index = np.array(list(angle_def.values()), dtype=int)
+    first, center, second = points[:, index[:, 0]], points[:, index[:, 1]], points[:, index[:, 2]]
+    vector1, vector2 = first - center, second - center
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos = (vector1 * vector2).sum(-1) / (np.linalg.norm(vector1, axis=-1) * np.linalg.norm(vector2, axis=-1))
+    return np.degrees(np.arccos(np.clip(cos, -1, 1)))
+
+def poseOffset(landmarks, first, second, axis, absolute):
+    """
+    offset of thresholds.OFFSETS for every frame, as the rules compute it on the world landmarks
+    first, second: landmark indices, return (frames,) float array in cm, NaN for frames without a skeleton
+    """
+    points = np.asarray(landmarks[:, 1, :, axis], dtype=np.float64)
+    offset = (points[:, first] - points[:, second]) * 100
+    return np.abs(offset) if absolute else offset
+
+def passes(kind, angle, sample, value):
+    if kind == 'min':
+        return angle >= value
+    if kind == 'max':
+        return angle <= value
+    if kind == 'tolerance':
+        return np.abs(angle - sample) <= value
+    if kind == 'lower_tolerance':
+        return angle >= sample - value
+    if kind == 'upper_tolerance':
+        return angle <= sample + value
+    raise ValueError(f"unknown threshold kind {kind}")
+
+def sweep(angles, samples, correct, kinds, grids, fixed=None, chunk=4096):
+    """
+    count the results of every combination of grid values
+    angles, samples, correct: (frames,) arrays of the labelled frames
+    fixed: optional (frames,) bool array, False where the other checks of the rule already mark the joint wrong
+    return values (combinations, len(kinds)) and tp, fp, fn (combinations,), positive = marked wrong
+    """
+    mesh = np.meshgrid(*grids, indexing='ij')
+    values = np.stack([grid.ravel() for grid in mesh], axis=1)
+    tp, fp, fn = (np.zeros(len(values), dtype=np.int64) for _ in range(3))
+    wrong = ~correct
+    # chunked over the frames so a product grid stays small in memory
+    for start in range(0, len(angles), chunk):
+        angle = angles[None, start:start + chunk]
+        sample = samples[None, start:start + chunk]
+        is_wrong = wrong[None, start:start + chunk]
+        passed = np.ones((len(values), angle.shape[1]), dtype=bool)
+        if fixed is not None:
+            passed &= fixed[None, start:start + chunk]
+        for column, kind in enumerate(kinds):
+            passed &= passes(kind, angle, sample, values[:, column, None])
+        tp += (~passed & is_wrong).sum(1)
+        fp += (~passed & ~is_wrong).sum(1)
+        fn += (passed & is_wrong).sum(1)
+    return values, tp, fp, fn
+
+def scores(tp, fp, fn, beta=1.0):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f = np.where(precision + recall > 0, (1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall), 0.0)
+    return precision, recall, f
+
+def readLabels(path):
+    """{(video, pose): [(start, end, joint, correct)]}"""
+    labels = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            end = int(row['end']) if row.get('end') else None
+            labels[(row['video'], row['pose'])].append((int(row['start'] or 0), end, row['joint'], row['correct'].strip() in ('1', 'true', 'True')))
+    return labels
+
+def labelMatrix(rows, frames, angle_names):
+    """(frames, angles) int8 array, -1 unlabelled, 0 wrong, 1 correct"""
+    matrix = np.full((frames, len(angle_names)), -1, dtype=np.int8)
+    for start, end, joint, correct in rows:
+        columns = slice(None) if joint == '*' else [angle_names.index(joint)]
+        matrix[start:end, columns] = int(correct)
+    return matrix
+
+def main():
+    parser = argparse.ArgumentParser(description="tune the angle thresholds of the pose rules on labelled videos")
+    parser.add_argument('labels', help="labels csv: video, pose, start, end, joint, correct")
+    parser.add_argument('--pose', help="only tune this pose")
+    parser.add_argument('--angle-step', type=float, default=1.0, help="grid step of min / max thresholds")
+    parser.add_argument('--tolerance-step', type=float, default=0.5, help="grid step of tolerance thresholds")
+    parser.add_argument('--beta', type=float, default=1.0, help="F-beta score used to pick the best value, > 1 favours recall")
+    parser.add_argument('--write', action='store_true', help="save the best values to the thresholds file")
+    args = parser.parse_args()
+
+    import yoga_toolkit.toolkit as toolkit
+    import yoga_toolkit.landmarkCache as landmarkCache
+    import yoga_toolkit.thresholds as thresholds
+    import yoga_toolkit.AngleNodeDef as AngleNodeDef
+    from yoga_toolkit.yogaPose import YogaPose
+
+    # (measures, sample angles, labels) of every labelled video, grouped by pose
+    # measures: {angle name or offset name: (frames,) array}
+    datasets = defaultdict(list)
+    for (video_path, pose_type), rows in readLabels(args.labels).items():
+        if args.pose and pose_type != args.pose:
+            continue
+        model = YogaPose(pose_type)
+        sample_angle_dict = toolkit.readSampleJsonFile(model.jsonfile_path) or {}
+        angle_names = list(model.angle_def)
+        landmarks, _ = landmarkCache.load(video_path)
+        angles = poseAngles(landmarks, model.angle_def, pose_type in PLANAR_POSES)
+        measures = {joint: angles[:, column] for column, joint in enumerate(angle_names)}
+        for name, (_, first, second, axis, absolute) in thresholds.OFFSETS.get(pose_type, {}).items():
+            measures[name] = poseOffset(landmarks, getattr(AngleNodeDef, first), getattr(AngleNodeDef, second), axis, absolute)
+        datasets[pose_type].append((measures, sample_angle_dict, labelMatrix(rows, len(angles), angle_names), angle_names))
+
+    def measureOf(pose_type, name, joint, measures):
+        return measures[name] if name in thresholds.OFFSETS.get(pose_type, {}) else measures[joint]
+
+    def otherChecks(pose_type, name, joint, measures, sample_angle_dict, angle_names):
+        """(frames,) bool, the other thresholds of the joint at their current values, e.g. the knee angle for the knee offset"""
+        passed = np.ones(len(measures[joint]), dtype=bool)
+        for other, kinds in thresholds.THRESHOLDS[pose_type].items():
+            if other == name or joint not in thresholds.angleNames(other, angle_names, pose_type):
+                continue
+            value = measureOf(pose_type, other, joint, measures)
+            for kind in kinds:
+                passed &= passes(kind, value, sample_angle_dict.get(joint, np.nan), thresholds.threshold(pose_type, other, kind))
+        return passed
+
+    best_values = {}
+    for pose_type, videos in datasets.items():
+        angle_names = videos[0][3]
+        for name, defaults in thresholds.THRESHOLDS[pose_type].items():
+            joints = thresholds.angleNames(name, angle_names, pose_type)
+            angles, samples, correct, fixed = [], [], [], []
+            for measures, sample_angle_dict, labels, _ in videos:
+                for joint in joints:
+                    column = angle_names.index(joint)
+                    value = measureOf(pose_type, name, joint, measures)
+                    mask = (labels[:, column] >= 0) & ~np.isnan(value)
+                    angles.append(value[mask])
+                    samples.append(np.full(mask.sum(), sample_angle_dict.get(joint, np.nan)))
+                    correct.append(labels[mask, column] == 1)
+                    fixed.append(otherChecks(pose_type, name, joint, measures, sample_angle_dict, angle_names)[mask])
+            if not joints or sum(len(a) for a in angles) == 0:
+                print(f"{pose_type} {name}: no labelled frames, skipped")
+                continue
+            angles, samples, correct, fixed = np.concatenate(angles), np.concatenate(samples), np.concatenate(correct), np.concatenate(fixed)
+
+            kinds = list(defaults)
+            grids = []
+            for kind in kinds:
+                low, high = OFFSET_GRID if name in thresholds.OFFSETS.get(pose_type, {}) else GRIDS[kind]
+                step = args.tolerance_step if 'tolerance' in kind else args.angle_step
+                grids.append(np.arange(low, high + step / 2, step))
+            start = time.perf_counter()
+            values, tp, fp, fn = sweep(angles, samples, correct, kinds, grids, fixed)
+            precision, recall, f = scores(tp, fp, fn, args.beta)
+            elapsed = time.perf_counter() - start
+
+            current = [thresholds.threshold(pose_type, name, kind) for kind in kinds]
+            _, current_tp, current_fp, current_fn = sweep(angles, samples, correct, kinds, [np.array([value], dtype=float) for value in current], fixed)
+            current_precision, current_recall, _ = scores(current_tp, current_fp, current_fn, args.beta)
+            best = int(np.argmax(f))
+            best_kinds = {kind: round(float(values[best, column]), 2) for column, kind in enumerate(kinds)}
+            best_values.setdefault(pose_type, {})[name] = best_kinds
+            print(f"{pose_type} {name}: {len(angles)} frames x {len(values)} values in {elapsed * 1000:.0f} ms | "
+                  f"current {dict(zip(kinds, current))} P {current_precision[0]:.2f} R {current_recall[0]:.2f} | "
+                  f"best {best_kinds} P {precision[best]:.2f} R {recall[best]:.2f}")
+
+    if args.write and best_values:
+        thresholds.writeThresholds(best_values)
+        print(f"saved to {thresholds.THRESHOLD_PATH}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+
+'''
+Frames tagged with their colour space.
+OpenCV decodes to BGR, mediapipe and Tk want RGB, and a plain array does not say which one it holds.
+A Frame keeps the array and its space together, Frame.to() only converts when the space differs,
+so a frame converted once can be passed on to every consumer without another copy.
+Layout is always the OpenCV one: uint8, height x width (x channels).
+'''
+
+BGR = 'BGR'
+RGB = 'RGB'
+GRAY = 'GRAY'
+
+CONVERSIONS = {
+    (BGR, RGB): cv2.COLOR_BGR2RGB,
+    (RGB, BGR): cv2.COLOR_RGB2BGR,
+    (BGR, GRAY): cv2.COLOR_BGR2GRAY,
+    (RGB, GRAY): cv2.COLOR_RGB2GRAY,
+    (GRAY, BGR): cv2.COLOR_GRAY2BGR,
+    (GRAY, RGB): cv2.COLOR_GRAY2RGB,
+}
+
+class Frame:
+    __slots__ = ('image', 'space')
+
+    def __init__(self, image, space=BGR):
+        self.image = image
+        self.space = space
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def width(self):
+        return self.image.shape[1]
+
+    @property
+    def height(self):
+        return self.image.shape[0]
+
+    def to(self, space):
+        """this frame in space, self when it is already in space"""
+        if space == self.space:
+            return self
+        if (self.space, space) not in CONVERSIONS:
+            raise ValueError(f"can not convert {self.space} to {space}")
+        return Frame(cv2.cvtColor(self.image, CONVERSIONS[(self.space, space)]), space)
+
+    def __repr__(self):
+        return f"Frame({self.space}, {self.image.shape})"
+
+def asFrame(image, space=BGR):
+    """wrap a plain array (OpenCV BGR by default), a Frame is returned as it is"""
+    if isinstance(image, Frame):
+        return image
+    return Frame(np.asarray(image), space)
+
+def toArray(image, space, source=BGR):
+    """array of image in space, image is a Frame or a plain array in source space"""
+    return asFrame(image, source).to(space).image
+
+def like(frame, reference, source=BGR):
+    """frame returned the way reference came in: a Frame stays a Frame, a plain array goes back to source space"""
+    if isinstance(reference, Frame):
+        return frame
+    return frame.to(source).image
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import time
+import cv2
+import numpy as np
+from importlib.metadata import version
+import yoga_toolkit.toolkit as toolkit
+import yoga_toolkit.colorSpace as colorSpace
+
+'''
+Mediapipe landmarks of video files, cached by video content hash and model args.
+The landmarks of a video are one float32 array of shape (frames, 2, 33, 4):
+[:, 0] image landmarks, [:, 1] world landmarks, each joint x, y, z, visibility, NaN for frames without a skeleton.
+The array is saved as <key>.npy and loaded memory-mapped, <key>.json holds the video metadata.
+Re-running the rules or re-sampling a reference then skips the inference.
+'''
+
+CACHE_DIR = 'data/landmark_cache'
+INDEX_NAME = 'index.json'
+
+def fileHash(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def sourceHash(video_path, cache_dir=CACHE_DIR):
+    """content hash of video_path, remembered in the index as long as the file size and mtime are unchanged"""
+    stat = os.stat(video_path)
+    index_path = os.path.join(cache_dir, INDEX_NAME)
+    try:
+        with open(index_path, 'r') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        index = {}
+    key = os.path.abspath(video_path)
+    entry = index.get(key)
+    if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return entry['hash']
+    digest = fileHash(video_path)
+    index[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest}
+    os.makedirs(cache_dir, exist_ok=True)
+    # other processes may write the index too, replace it in one step
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(index, file, indent=4)
+    os.replace(tmp_path, index_path)
+    return digest
+
+def cacheKey(digest, args):
+    params = json.dumps(dict(args, mediapipe=version('mediapipe')), sort_keys=True)
+    return f"{digest[:16]}_{hashlib.sha1(params.encode('utf-8')).hexdigest()[:8]}"
+
+def compute(video_path, args):
+    """run mediapipe with args on every frame of video_path, return (landmarks array, metadata)"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise OSError(f"can not open {video_path}")
+    meta = {
+        'video': video_path,
+        'fps': cap.get(cv2.CAP_PROP_FPS) or 30,
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'args': args,
+        'mediapipe': version('mediapipe'),
+    }
+    rows = []
+    start = time.perf_counter()
+    with toolkit.createPoseModel(args) as pose:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            results = pose.process(colorSpace.toArray(frame, colorSpace.RGB))
+            row = np.full((2, 33, 4), np.nan, dtype=np.float32)
+            if results.pose_landmarks is not None and results.pose_world_landmarks is not None:
+                row[0] = toolkit.landmarksToArray(results.pose_landmarks.landmark)
+                row[1] = toolkit.landmarksToArray(results.pose_world_landmarks.landmark)
+            rows.append(row)
+    cap.release()
+    landmarks = np.stack(rows) if rows else np.empty((0, 2, 33, 4), dtype=np.float32)
+    meta['frames'] = len(landmarks)
+    meta['detected'] = int((~np.isnan(landmarks[:, 0, 0, 0])).sum())
+    meta['seconds'] = round(time.perf_counter() - start, 2)
+    return landmarks, meta
+
+def load(video_path, args=None, cache_dir=CACHE_DIR):
+    """
+    landmarks of video_path, computed and stored on the first call
+    args: mediapipe Pose args, default toolkit.VIDEO_POSE_ARGS
+    return (read-only memory-mapped array of shape (frames, 2, 33, 4), metadata dict)
+    """
+    args = dict(toolkit.VIDEO_POSE_ARGS if args is None else args)
+    path = os.path.join(cache_dir, cacheKey(sourceHash(video_path, cache_dir), args))
+    # the metadata is written last, a missing .json means an unfinished entry
+    if not os.path.exists(f"{path}.json"):
+        landmarks, meta = compute(video_path, args)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, landmarks)
+        os.replace(tmp_path, f"{path}.npy")
+        with open(f"{path}.{os.getpid()}.tmp", 'w') as file:
+            json.dump(meta, file, indent=4)
+        os.replace(f"{path}.{os.getpid()}.tmp", f"{path}.json")
+    with open(f"{path}.json", 'r') as file:
+        meta = json.load(file)
+    return np.load(f"{path}.npy", mmap_mode='r'), meta
+
+def results(landmarks):
+    """
+    per frame (point2d, point3d) lists of toolkit.Landmark like toolkit.getMediapipeResult,
+    (0, 0) for frames without a skeleton
+    """
+    for row in landmarks:
+        if np.isnan(row[0, 0, 0]):
+            yield 0, 0
+        else:
+            yield toolkit.landmarksFromArray(row[0]), toolkit.landmarksFromArray(row[1])
+
+if __name__ == '__main__':
+    import sys
+    for video_path in sys.argv[1:]:
+        landmarks, meta = load(video_path)
+        print(f"{video_path}: {meta['frames']} frames, {meta['detected']} detected")
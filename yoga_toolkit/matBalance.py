@@ -0,0 +1,157 @@
+import math
+import threading
+import numpy as np
+
+class SwayMetrics:
+    '''
+    sliding window balance metrics over the last `size` centre-of-pressure samples
+    running sums are updated in O(1) per sample, the buffers are allocated once
+    units: mat cells and seconds
+    update / reset (heatmap thread) and summary (UI thread) are serialized by a lock
+    '''
+    def __init__(self, size=150):
+        self.size = size
+        self.t = np.zeros(size)
+        self.x = np.zeros(size)
+        self.y = np.zeros(size)
+        self.left = np.zeros(size)
+        self.step = np.zeros(size)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.head = 0
+        self.count = 0
+        self.sum_x = self.sum_y = 0.0
+        self.sum_xx = self.sum_yy = self.sum_xy = 0.0
+        self.sum_left = 0.0
+        self.sum_step = 0.0
+
+    def update(self, t, x, y, left):
+        """add one sample
+
+        Args:
+            t (float): timestamp in seconds
+            x, y (float): centre of pressure in cells
+            left (float): left_ratio of the grid
+        """
+        with self.lock:
+            self._update(t, x, y, left)
+
+    def _update(self, t, x, y, left):
+        i = self.head
+        if self.count == self.size:
+            # evict the oldest sample, it is overwritten below
+            ox, oy = self.x[i], self.y[i]
+            self.sum_x -= ox
+            self.sum_y -= oy
+            self.sum_xx -= ox * ox
+            self.sum_yy -= oy * oy
+            self.sum_xy -= ox * oy
+            self.sum_left -= self.left[i]
+            self.sum_step -= self.step[i]
+        else:
+            self.count += 1
+        if self.count > 1:
+            prev = i - 1 if i > 0 else self.size - 1
+            step = math.hypot(x - self.x[prev], y - self.y[prev])
+        else:
+            step = 0.0
+        self.t[i] = t
+        self.x[i] = x
+        self.y[i] = y
+        self.left[i] = left
+        self.step[i] = step
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_xx += x * x
+        self.sum_yy += y * y
+        self.sum_xy += x * y
+        self.sum_left += left
+        self.sum_step += step
+        self.head = i + 1 if i + 1 < self.size else 0
+        if self.head == 0:
+            self._resum()
+
+    def update_feature(self, t, feature):
+        """add the centre of pressure of a yogamat.MatFeature, skipped when nobody is on the mat"""
+        if feature.cop is not None:
+            self.update(t, feature.cop[1], feature.cop[0], feature.left_ratio)
+
+    def _resum(self):
+        # recompute the running sums once per buffer cycle so the float error does not accumulate
+        n = self.count
+        self.sum_x = float(self.x[:n].sum())
+        self.sum_y = float(self.y[:n].sum())
+        self.sum_xx = float(np.dot(self.x[:n], self.x[:n]))
+        self.sum_yy = float(np.dot(self.y[:n], self.y[:n]))
+        self.sum_xy = float(np.dot(self.x[:n], self.y[:n]))
+        self.sum_left = float(self.left[:n].sum())
+        self.sum_step = float(self.step[:n].sum())
+
+    @property
+    def oldest(self):
+        return self.head if self.count == self.size else 0
+
+    @property
+    def duration(self):
+        if self.count < 2:
+            return 0.0
+        newest = self.head - 1 if self.head > 0 else self.size - 1
+        return float(self.t[newest] - self.t[self.oldest])
+
+    @property
+    def path_length(self):
+        """sway path length inside the window"""
+        if self.count < 2:
+            return 0.0
+        return max(self.sum_step - self.step[self.oldest], 0.0)
+
+    @property
+    def velocity(self):
+        """mean sway velocity, cells per second"""
+        duration = self.duration
+        return self.path_length / duration if duration > 0 else 0.0
+
+    def _cov(self):
+        n = self.count
+        mx, my = self.sum_x / n, self.sum_y / n
+        var_x = max(self.sum_xx / n - mx * mx, 0.0)
+        var_y = max(self.sum_yy / n - my * my, 0.0)
+        cov_xy = self.sum_xy / n - mx * my
+        return var_x, var_y, cov_xy
+
+    @property
+    def rms(self):
+        """root mean square distance from the mean centre of pressure"""
+        if self.count == 0:
+            return 0.0
+        var_x, var_y, _ = self._cov()
+        return math.sqrt(var_x + var_y)
+
+    @property
+    def area(self):
+        """95% confidence ellipse area of the centre of pressure"""
+        if self.count < 2:
+            return 0.0
+        var_x, var_y, cov_xy = self._cov()
+        return math.pi * 5.991 * math.sqrt(max(var_x * var_y - cov_xy * cov_xy, 0.0))
+
+    @property
+    def left_ratio(self):
+        """mean weight on the left half of the mat"""
+        return self.sum_left / self.count if self.count else 0.5
+
+    def summary(self):
+        with self.lock:
+            return {
+                'path_length': self.path_length,
+                'velocity': self.velocity,
+                'rms': self.rms,
+                'area': self.area,
+                'left_ratio': self.left_ratio,
+            }
@@ -0,0 +1,212 @@
+import os
+import struct
+import threading
+import time
+import argparse
+import numpy as np
+
+'''
+Yoga mat recording format (*.ymat)
+
+file header: magic(4s) version(B)
+each record: timestamp(d, seconds from the first record) kind(B) length(I) payload
+    kind 0: raw bytes read from the serial port
+    kind 1: decoded raw 12x18 grid, uint8, row major
+'''
+
+MAGIC = b'YMAT'
+VERSION = 1
+RAW = 0
+GRID = 1
+file_header = struct.Struct('<4sB')
+record_header = struct.Struct('<dBI')
+
+class MatRecorder:
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(file_header.pack(MAGIC, VERSION))
+        self.start_t = None
+
+    def _write(self, kind, payload, t):
+        now = time.monotonic() if t is None else t
+        if self.start_t is None:
+            self.start_t = now
+        self.file.write(record_header.pack(now - self.start_t, kind, len(payload)))
+        self.file.write(payload)
+
+    def write_raw(self, data, t=None):
+        self._write(RAW, bytes(data), t)
+
+    def write_grid(self, grid, t=None):
+        self._write(GRID, np.ascontiguousarray(grid, dtype=np.uint8).tobytes(), t)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class RecordingSource:
+    '''
+    wrap a serial port and record every chunk read from it
+    '''
+    def __init__(self, source, recorder):
+        self.source = source
+        self.recorder = recorder
+
+    def read(self, size=1):
+        data = self.source.read(size)
+        if len(data) > 0:
+            self.recorder.write_raw(data)
+        return data
+
+def read_records(path):
+    """iterate over a recording
+
+    Args:
+        path (str): *.ymat file path
+
+    Returns:
+        generator of (timestamp, kind, payload)
+    """
+    with open(path, 'rb') as file:
+        magic, version = file_header.unpack(file.read(file_header.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a yoga mat recording")
+        while True:
+            head = file.read(record_header.size)
+            if len(head) < record_header.size:
+                return
+            t, kind, length = record_header.unpack(head)
+            payload = file.read(length)
+            if len(payload) < length:
+                return
+            yield t, kind, payload
+
+class MatReplay:
+    '''
+    serial port stand-in that plays a recording back
+    realtime: True -> release each record at its recorded time, False -> as fast as possible
+    loop: restart from the beginning at the end of the recording
+    '''
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.buffer = b''
+        self.records = self._records()
+
+    def _records(self):
+        while True:
+            start = time.monotonic()
+            for t, kind, payload in read_records(self.path):
+                if self.realtime:
+                    delay = start + t - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                yield t, kind, payload
+            if not self.loop:
+                return
+
+    def read(self, size=1):
+        """same contract as serial.Serial.read, returns b'' at the end of the recording"""
+        while len(self.buffer) < size:
+            record = next(self.records, None)
+            if record is None:
+                break
+            if record[1] == RAW:
+                self.buffer += record[2]
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def grids(self):
+        """iterate over the grid records as (timestamp, 12x18 uint8 grid)"""
+        for t, kind, payload in self.records:
+            if kind == GRID:
+                yield t, np.frombuffer(payload, dtype=np.uint8).reshape((12, 18))
+
+    def close(self):
+        self.records.close()
+
+def serve_pty(path, realtime=True, loop=False):
+    """play the raw bytes of a recording into a pseudo-terminal (Linux only)
+
+    Args:
+        path (str): *.ymat file path
+        realtime (bool): keep the recorded timing
+        loop (bool): repeat the recording
+
+    Returns:
+        device name which can be opened by serial.Serial, and the writer thread
+    """
+    import pty
+    import tty
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    replay = MatReplay(path, realtime, loop)
+
+    def write():
+        for _, kind, payload in replay.records:
+            if kind == RAW:
+                os.write(master, payload)
+
+    thread = threading.Thread(target=write, daemon=True)
+    thread.start()
+    return os.ttyname(slave), thread
+
+def record(port, baud, path, seconds, grid):
+    import serial
+    import yoga_toolkit.yogamat as yogamat
+    ser = serial.Serial(port, baud)
+    end = time.monotonic() + seconds
+    with MatRecorder(path) as recorder:
+        if grid:
+            while time.monotonic() < end:
+                recorder.write_grid(yogamat.read_raw_grid(ser))
+        else:
+            while time.monotonic() < end:
+                recorder.write_raw(ser.read(yogamat.frame_size))
+    ser.close()
+
+def bench(path):
+    import yoga_toolkit.yogamat as yogamat
+    replay = MatReplay(path, realtime=False)
+    count = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            yogamat.get_heatmap(replay)
+            count += 1
+    except EOFError:
+        pass
+    used = time.perf_counter() - start
+    print(f"{count} frames in {used:.3f}s ({count / used if used > 0 else 0:.1f} fps)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="record / replay yoga mat streams")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('record', help='record the yoga mat serial stream')
+    p.add_argument('path')
+    p.add_argument('--port', default='COM3')
+    p.add_argument('--baud', type=int, default=115200)
+    p.add_argument('--seconds', type=float, default=60)
+    p.add_argument('--grid', action='store_true', help='store decoded grids instead of raw bytes')
+    p = sub.add_parser('pty', help='replay a recording into a pseudo-terminal')
+    p.add_argument('path')
+    p.add_argument('--fast', action='store_true', help='as fast as possible instead of real time')
+    p.add_argument('--loop', action='store_true')
+    p = sub.add_parser('bench', help='run the heatmap pipeline on a recording as fast as possible')
+    p.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.port, args.baud, args.path, args.seconds, args.grid)
+    elif args.command == 'pty':
+        name, thread = serve_pty(args.path, not args.fast, args.loop)
+        print(f"replaying {args.path} on {name}")
+        thread.join()
+    elif args.command == 'bench':
+        bench(args.path)
@@ -0,0 +1,98 @@
+'''
+Pressure rules of each pose, evaluated on yogamat.MatFeature in the same tick as the landmark rules
+
+each check: roi key -> (feature name, min, max, tip), None means no limit
+'''
+
+TREE_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 1, 1, "請將右腳抬起，只用左腳站立在瑜珈墊上"),
+    'MAT_CENTER': ('cop_x', 0.25, 0.75, "請將重心保持在瑜珈墊中央，避免身體傾斜"),
+}
+
+WARRIOR_II_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 2, 2, "請將雙腳踩在瑜珈墊上"),
+    'MAT_STANCE': ('stance_width', 8, None, "請將雙腳再拉開一些距離"),
+    'MAT_BALANCE': ('left_ratio', 0.3, 0.7, "請將重量平均分配在雙腳上"),
+}
+
+PLANK_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 2, 4, "請將手肘與腳尖撐在瑜珈墊上"),
+    'MAT_STANCE': ('stance_width', 6, None, "請將腳再往後伸，使身體保持一直線"),
+}
+
+REVERSE_PLANK_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 2, 4, "請將雙手與腳跟撐在瑜珈墊上"),
+    'MAT_STANCE': ('stance_width', 6, None, "請將腳再往前伸，使身體保持一直線"),
+}
+
+CHILDS_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 1, 4, "請將身體趴在瑜珈墊上"),
+}
+
+DOWNWARDDOG_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 2, 4, "請將雙手與雙腳撐在瑜珈墊上"),
+    'MAT_STANCE': ('stance_width', 6, None, "請將雙手與雙腳再拉開一些距離"),
+}
+
+LOWLUNGE_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 2, 3, "請將前腳與後腳膝蓋放在瑜珈墊上"),
+    'MAT_STANCE': ('stance_width', 6, None, "請將後腳再往後伸"),
+}
+
+SEATEDFORWARDBEND_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 1, 3, "請坐在瑜珈墊上，並將雙腳向前伸直"),
+}
+
+BRIDGE_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 2, 4, "請將肩膀與雙腳貼在瑜珈墊上"),
+}
+
+PYRAMID_PRESSURE = {
+    'MAT_FOOT': ('foot_count', 2, 2, "請將雙腳踩在瑜珈墊上"),
+    'MAT_STANCE': ('stance_width', 5, 14, "請調整雙腳前後的距離"),
+    'MAT_BALANCE': ('left_ratio', 0.3, 0.7, "請將重量平均分配在雙腳上"),
+}
+
+POSE_PRESSURE = {
+    'Tree': TREE_PRESSURE,
+    'WarriorII': WARRIOR_II_PRESSURE,
+    'Plank': PLANK_PRESSURE,
+    'ReversePlank': REVERSE_PLANK_PRESSURE,
+    'Childs': CHILDS_PRESSURE,
+    'DownwardDog': DOWNWARDDOG_PRESSURE,
+    'LowLunge': LOWLUNGE_PRESSURE,
+    'SeatedForwardBend': SEATEDFORWARDBEND_PRESSURE,
+    'Bridge': BRIDGE_PRESSURE,
+    'Pyramid': PYRAMID_PRESSURE,
+}
+
+EMPTY_MAT_TIP = "請站上瑜珈墊"
+
+def pressureRule(roi, tips, feature, rule):
+    """check the pressure rule and merge the result into the landmark result
+
+    Args:
+        roi (dict): roi of the landmark rule, MAT_* keys are set here
+        tips (str): tips of the landmark rule, only replaced when the landmark rule passed
+        feature (yogamat.MatFeature): features of the mat grid aligned with this frame
+        rule (dict): pressure rule of the pose, see POSE_PRESSURE
+
+    Returns:
+        roi (dict)
+        tips (str)
+    """
+    tip_flag = tips.startswith("動作正確")
+    if feature.total == 0:
+        for key in rule:
+            roi[key] = False
+        return roi, EMPTY_MAT_TIP if tip_flag else tips
+    for key, (name, min_val, max_val, tip) in rule.items():
+        value = getattr(feature, name)
+        if (min_val is None or value >= min_val) and (max_val is None or value <= max_val):
+            roi[key] = True
+        else:
+            roi[key] = False
+            if tip_flag:
+                tips = tip
+                tip_flag = False
+    return roi, tips
@@ -0,0 +1,115 @@
+import json
+import os
+import struct
+import time
+import numpy as np
+
+'''
+Append-only log of fixed size records (numpy structured dtype with a float64 't' field), written in chunks
+
+data file: magic(4s) version(B) header length(I) json header (dtype, meta), then the records
+index file (<path>.idx): (t, record) of the first record of every chunk, used to seek by time
+a reader maps the records with np.memmap, nothing is parsed
+'''
+
+MAGIC = b'YLOG'
+VERSION = 1
+prefix = struct.Struct('<4sBI')
+INDEX_RECORD = np.dtype([('t', '<f8'), ('record', '<u8')])
+ALIGN = 64
+
+class RecordWriter:
+    '''
+    dtype: numpy structured dtype of a record, must contain 't'
+    chunk_size: records buffered before one write
+    meta: json serializable info stored in the header
+    '''
+    def __init__(self, path, dtype, chunk_size=1024, meta=None):
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.buffer = np.zeros(chunk_size, dtype=self.dtype)
+        self.n = 0
+        self.count = 0
+        self.file = open(path, 'wb')
+        self.index = open(path + '.idx', 'wb')
+        header = json.dumps({
+            'dtype': self.dtype.descr,
+            'meta': meta or {},
+            'wall_offset': time.time() - time.monotonic(),
+        }).encode('utf-8')
+        # pad so the records start aligned
+        header += b' ' * (-(prefix.size + len(header)) % ALIGN)
+        self.file.write(prefix.pack(MAGIC, VERSION, len(header)))
+        self.file.write(header)
+
+    def append(self, *values):
+        """append one record, values in the order of the dtype fields"""
+        self.buffer[self.n] = values
+        self.n += 1
+        if self.n == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.n == 0:
+            return
+        self.index.write(np.array([(self.buffer[0]['t'], self.count)], dtype=INDEX_RECORD).tobytes())
+        self.file.write(self.buffer[:self.n].tobytes())
+        self.file.flush()
+        self.index.flush()
+        self.count += self.n
+        self.n = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class RecordReader:
+    '''
+    records: np.memmap of all complete records
+    index: first (t, record) of every chunk
+    '''
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            magic, version, length = prefix.unpack(file.read(prefix.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a record log")
+            header = json.loads(file.read(length).decode('utf-8'))
+        self.dtype = np.dtype([tuple(field) for field in header['dtype']])
+        self.meta = header['meta']
+        self.wall_offset = header['wall_offset']
+        offset = prefix.size + length
+        count = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+        if os.path.exists(path + '.idx'):
+            self.index = np.fromfile(path + '.idx', dtype=INDEX_RECORD)
+        else:
+            self.index = np.zeros(0, dtype=INDEX_RECORD)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    def seek(self, t):
+        """index of the first record with timestamp >= t, O(log n)"""
+        if len(self.index) == 0:
+            return int(np.searchsorted(self.records['t'], t))
+        chunk = max(int(np.searchsorted(self.index['t'], t, side='right')) - 1, 0)
+        start = int(self.index['record'][chunk])
+        end = int(self.index['record'][chunk + 1]) if chunk + 1 < len(self.index) else len(self.records)
+        return start + int(np.searchsorted(self.records['t'][start:end], t))
+
+    def between(self, t0, t1):
+        """records with t0 <= t < t1, a view into the mapped file"""
+        return self.records[self.seek(t0):self.seek(t1)]
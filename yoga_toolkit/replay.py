@@ -0,0 +1,253 @@
+import os
+import time
+import argparse
+import numpy as np
+import yoga_toolkit.toolkit as toolkit
+import yoga_toolkit.tips as tips
+import yoga_toolkit.landmarkCache as landmarkCache
+from yoga_toolkit.yogaPose import YogaPose
+from yoga_toolkit.yogamat import MatFeature, load_mat_log
+from yoga_toolkit.sessionLog import roiNames, loadSessionLog
+
+'''
+Replay a recorded practice through the detection, rule and tip path of the practice screen.
+Sources:
+    video file  -> every frame goes through YogaPose.detect (inference, rules, pressure rule, drawing)
+    --landmarks -> landmarks of the video from landmarkCache, YogaPose.evaluate + evaluatePressure
+    .ylog       -> landmarks of a session log, with the timestamps of the session
+The clock is the timestamp of the frame, never the wall clock, so every run gives the same outputs.
+Modes: fast (unthrottled), realtime (paced to the timestamps), step (Enter for the next frame).
+The per-frame outputs (detected, tip code, roi bitmask, angles) can be saved as a baseline
+and compared with later runs to catch behaviour changes, the throughput is reported for performance checks.
+
+python -m yoga_toolkit.replay output_session_<time>.ylog --mat output_mat_<time>.ylog --baseline base.npz
+'''
+
+MODES = ('fast', 'realtime', 'step')
+
+def outputDtype(angle_count):
+    return np.dtype([
+        ('t', '<f8'),
+        ('detected', '?'),
+        ('tip', '<i2'),
+        ('roi', '<u4'),
+        ('angles', '<f4', (angle_count,)),
+    ])
+
+def videoFrames(path):
+    """(t, frame, None, None) of every frame of a video, t from the frame index"""
+    import cv2
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index / fps, frame, None, None
+            index += 1
+    finally:
+        cap.release()
+
+def cachedLandmarks(path):
+    """(t, None, point2d, point3d) from the landmark cache of a video"""
+    landmarks, meta = landmarkCache.load(path)
+    for index, (point2d, point3d) in enumerate(landmarkCache.results(landmarks)):
+        yield index / meta['fps'], None, point2d, point3d
+
+def sessionLandmarks(path):
+    """(t, None, point2d, point3d) from a session log, t is the monotonic time of the session"""
+    log = loadSessionLog(path)
+    for record in log.records:
+        landmarks = record['landmarks'].astype(np.float32)
+        if np.isnan(landmarks[0, 0, 0]):
+            yield float(record['t']), None, 0, 0
+        else:
+            yield float(record['t']), None, toolkit.landmarksFromArray(landmarks[0]), toolkit.landmarksFromArray(landmarks[1])
+
+class MatTimeline:
+    '''
+    MatFeature of a mat log at a replay time, offset maps the replay clock to the clock of the log
+    '''
+    def __init__(self, path, offset=0.0, max_age=0.2):
+        self.log = load_mat_log(path)
+        self.offset = offset
+        self.max_age = max_age
+
+    def feature_at(self, t):
+        """MatFeature of the grid closest to replay time t, None if none within max_age, as YogaMat.feature_at"""
+        t += self.offset
+        grid_t = self.log.records['t']
+        index = self.log.seek(t)
+        candidates = [i for i in (index - 1, index) if 0 <= i < len(grid_t)]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda i: abs(grid_t[i] - t))
+        if abs(grid_t[best] - t) > self.max_age:
+            return None
+        return MatFeature(self.log.records['grid'][best])
+
+class Replay:
+    '''
+    pose_type: pose of the recording
+    source: video path, or session log path (.ylog)
+    landmarks: True -> use the landmark cache of the video instead of running the inference
+    mat: path of the mat log recorded with the session, None -> no pressure rule
+    '''
+    def __init__(self, pose_type, source, mode='fast', landmarks=False, mat=None, size=(600, 500)):
+        if mode not in MODES:
+            raise ValueError(f"mode has to be one of {MODES}")
+        self.model = YogaPose(pose_type)
+        self.model.initialDetect()
+        self.source = source
+        self.mode = mode
+        self.size = size
+        self.angle_names = list(self.model.angle_def)
+        self.roi_names = roiNames(self.model)
+        if source.endswith('.ylog'):
+            self.frames = sessionLandmarks(source)
+            clock_is_monotonic = True
+        elif landmarks:
+            self.frames = cachedLandmarks(source)
+            clock_is_monotonic = False
+        else:
+            self.frames = videoFrames(source)
+            clock_is_monotonic = False
+        self.mat = None
+        if mat is not None:
+            self.mat = MatTimeline(mat)
+            if not clock_is_monotonic and len(self.mat.log):
+                # video time 0 is the first grid of the mat log
+                self.mat.offset = float(self.mat.log.records['t'][0])
+        self.latency = []
+        self.errors = 0
+
+    def step(self, frame, point2d, point3d, mat_feature):
+        model = self.model
+        if frame is not None:
+            model.detect(frame, self.size[0], self.size[1], False, mat_feature, mirror=False)
+        elif model.evaluate(point2d, point3d):
+            model.evaluatePressure(mat_feature)
+        detected = model.detected
+        angles = [model.angle_dict[name] if detected else np.nan for name in self.angle_names]
+        roi = sum(1 << bit for bit, name in enumerate(self.roi_names) if detected and model.roi.get(name))
+        return detected, tips.tipCode(model.tips), roi, angles
+
+    def run(self, on_frame=None):
+        """
+        replay the whole source, return the structured array of per-frame outputs
+        a frame that raises is recorded as not detected with tip -1 and counted in self.errors
+        on_frame: optional callback(index, output record) e.g. to print the tips
+        """
+        self.model.reset()
+        self.errors = 0
+        outputs = []
+        first_t, start_wall = None, time.perf_counter()
+        for t, frame, point2d, point3d in self.frames:
+            if first_t is None:
+                first_t = t
+            if self.mode == 'realtime':
+                delay = (t - first_t) - (time.perf_counter() - start_wall)
+                if delay > 0:
+                    time.sleep(delay)
+            elif self.mode == 'step':
+                input(f"frame {len(outputs)} t={t - first_t:.3f}, Enter for the next frame")
+            mat_feature = self.mat.feature_at(t) if self.mat is not None else None
+            begin = time.perf_counter()
+            try:
+                output = (t - first_t,) + self.step(frame, point2d, point3d, mat_feature)
+            except Exception as e:
+                # same as the practice screen, a failing frame is skipped; it is counted and recorded with tip -1
+                if not isinstance(e, (ValueError, ZeroDivisionError)):
+                    print(f'frame {len(outputs)} t={t - first_t:.3f}: detect error: {e!r}')
+                self.errors += 1
+                output = (t - first_t, False, -1, 0, [np.nan] * len(self.angle_names))
+            self.latency.append(time.perf_counter() - begin)
+            outputs.append(output)
+            if on_frame is not None:
+                on_frame(len(outputs) - 1, outputs[-1])
+        self.elapsed = time.perf_counter() - start_wall
+        return np.array(outputs, dtype=outputDtype(len(self.angle_names)))
+
+    def report(self):
+        latency = np.array(self.latency) * 1000
+        if len(latency) == 0:
+            return "no frame"
+        return (f"{len(latency)} frames in {self.elapsed:.2f} s, {len(latency) / max(self.elapsed, 1e-9):.1f} fps, "
+                f"latency mean {latency.mean():.2f} ms p95 {np.percentile(latency, 95):.2f} ms max {latency.max():.2f} ms, "
+                f"{self.errors} failed frames")
+
+def saveBaseline(path, outputs, replay):
+    """the tip table is saved with the codes, a tip added later shifts the codes of the tips after it"""
+    np.savez(path, outputs=outputs, pose=replay.model.type, angles=replay.angle_names, roi=replay.roi_names,
+             tips=np.array(tips.allTips()))
+
+def tipTexts(codes, table):
+    """tip text of every code, '' for no tip, <unknown> for -1 (unknown tip or failed frame)"""
+    lookup = np.array([''] + list(table) + ['<unknown>'], dtype=object)
+    return lookup[codes.astype(int)]
+
+def compareBaseline(path, outputs, replay, angle_tolerance=0.01):
+    """
+    indices of the frames whose outputs differ from the baseline, and the frame count difference
+    raise ValueError if the baseline was saved for another pose, angle set or roi set
+    """
+    with np.load(path) as baseline:
+        expected = baseline['outputs']
+        pose = str(baseline['pose'])
+        angle_names = baseline['angles'].tolist()
+        roi_names = baseline['roi'].tolist()
+        tip_table = baseline['tips'].tolist()
+    if pose != replay.model.type:
+        raise ValueError(f"baseline is for pose {pose}, not {replay.model.type}")
+    if angle_names != replay.angle_names:
+        raise ValueError(f"baseline angles {angle_names} differ from {replay.angle_names}")
+    if roi_names != replay.roi_names:
+        raise ValueError(f"baseline roi {roi_names} differ from {replay.roi_names}")
+    n = min(len(expected), len(outputs))
+    a, b = outputs[:n], expected[:n]
+    angles_a, angles_b = a['angles'], b['angles']
+    angle_changed = ~((np.abs(angles_a - angles_b) <= angle_tolerance) | (np.isnan(angles_a) & np.isnan(angles_b)))
+    tip_changed = tipTexts(a['tip'], tips.allTips()) != tipTexts(b['tip'], tip_table)
+    changed = (a['detected'] != b['detected']) | tip_changed | (a['roi'] != b['roi']) | angle_changed.any(axis=1)
+    return np.flatnonzero(changed), len(outputs) - len(expected)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="replay a recorded practice through the pose rules")
+    parser.add_argument('source', help="video file or session log (.ylog)")
+    parser.add_argument('--pose', help="pose type, read from the session log when not given")
+    parser.add_argument('--mode', default='fast', choices=MODES)
+    parser.add_argument('--landmarks', action='store_true', help="use the landmark cache of the video")
+    parser.add_argument('--mat', help="mat log of the session")
+    parser.add_argument('--baseline', help="compare with this baseline (.npz)")
+    parser.add_argument('--save-baseline', help="save the outputs as a baseline (.npz)")
+    parser.add_argument('--verbose', action='store_true', help="print the tip of every frame")
+    args = parser.parse_args()
+
+    pose_type = args.pose
+    if pose_type is None and args.source.endswith('.ylog'):
+        pose_type = loadSessionLog(args.source).pose
+    if pose_type is None:
+        parser.error("--pose is required for a video")
+    replay = Replay(pose_type, args.source, args.mode, args.landmarks, args.mat)
+    on_frame = (lambda index, output: print(index, f"{output[0]:.3f}", tips.tipText(output[2]))) if args.verbose or args.mode == 'step' else None
+    outputs = replay.run(on_frame)
+    print(replay.report())
+    if args.save_baseline:
+        saveBaseline(args.save_baseline, outputs, replay)
+        print(f"baseline saved to {args.save_baseline}")
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            parser.error(f"{args.baseline} not found")
+        try:
+            changed, count_difference = compareBaseline(args.baseline, outputs, replay)
+        except ValueError as e:
+            parser.error(str(e))
+        if len(changed) == 0 and count_difference == 0:
+            print("outputs match the baseline")
+        else:
+            print(f"{len(changed)} frames differ from the baseline, frame count difference {count_difference}")
+            for index in changed[:20]:
+                print(f"  frame {index}: tip {tips.tipText(int(outputs['tip'][index]))}")
+            raise SystemExit(1)
@@ -0,0 +1,123 @@
+import numpy as np
+import yoga_toolkit.tips as tips
+import yoga_toolkit.pressureRule as pressureRule
+from yoga_toolkit.recordLog import RecordWriter, RecordReader
+
+'''
+Log of a practice session, one record per evaluated camera frame:
+t (time.monotonic), landmarks (image and world, float16), angles of the pose, roi bitmask and tip code.
+evaluated marks the roi bits that were checked, the MAT_* bits are not evaluated when no yoga mat was read.
+It is a recordLog file, so it is written in chunks, indexed by time and read memory-mapped.
+The names of the angles and roi bits and the tip table are stored in the header,
+post-session analysis (e.g. when did the left knee fail) runs on the log without the video.
+'''
+
+def sessionDtype(angle_count):
+    return np.dtype([
+        ('t', '<f8'),
+        ('landmarks', '<f2', (2, 33, 4)),
+        ('angles', '<f4', (angle_count,)),
+        ('roi', '<u4'),
+        ('evaluated', '<u4'),
+        ('tip', '<i2'),
+    ])
+
+def roiNames(model):
+    """bit order of the roi bitmask: the landmark roi of the pose, then its pressure rule keys"""
+    names = [name for name in model.roi if not name.startswith("MAT_")]
+    return names + list(pressureRule.POSE_PRESSURE[model.type])
+
+class SessionWriter:
+    '''
+    model: the YogaPose of the session, append() reads its last result
+    '''
+    def __init__(self, path, model, chunk_size=256):
+        self.model = model
+        self.angle_names = list(model.angle_def)
+        self.roi_names = roiNames(model)
+        if len(self.roi_names) > 32:
+            raise ValueError("roi bitmask holds 32 joints")
+        self.landmarks = np.full((2, 33, 4), np.nan, dtype=np.float16)
+        self.log = RecordWriter(path, sessionDtype(len(self.angle_names)), chunk_size, meta={
+            'type': 'session',
+            'pose': model.type,
+            'angles': self.angle_names,
+            'roi': self.roi_names,
+            'tips': tips.allTips(),
+        })
+
+    def append(self, t, point2d, point3d, detected=True):
+        """log the result of model.detect / model.evaluate for the frame taken at t"""
+        model = self.model
+        if detected:
+            self.landmarks[0] = [(p.x, p.y, p.z, p.visibility) for p in point2d]
+            self.landmarks[1] = [(p.x, p.y, p.z, p.visibility) for p in point3d]
+            angles = [model.angle_dict[name] for name in self.angle_names]
+            roi = sum(1 << bit for bit, name in enumerate(self.roi_names) if model.roi.get(name))
+            # evaluatePressure removes the MAT_* keys when there is no mat feature
+            evaluated = sum(1 << bit for bit, name in enumerate(self.roi_names) if name in model.roi)
+        else:
+            self.landmarks[:] = np.nan
+            angles = [np.nan] * len(self.angle_names)
+            roi = 0
+            evaluated = 0
+        self.log.append(t, self.landmarks, angles, roi, evaluated, tips.tipCode(model.tips))
+
+    def close(self):
+        self.log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class SessionLog(RecordReader):
+    '''
+    records: memory-mapped records, records['t'], records['angles'] ...
+    angle_names, roi_names, tips: tables of the header
+    '''
+    def __init__(self, path):
+        super().__init__(path)
+        if self.meta.get('type') != 'session':
+            raise ValueError(f"{path} is not a session log")
+        self.pose = self.meta['pose']
+        self.angle_names = self.meta['angles']
+        self.roi_names = self.meta['roi']
+        self.tips = self.meta['tips']
+
+    def angle(self, name, records=None):
+        records = self.records if records is None else records
+        return records['angles'][:, self.angle_names.index(name)]
+
+    def roi(self, name, records=None):
+        """per record True if the joint passed its rule"""
+        records = self.records if records is None else records
+        return (records['roi'] >> np.uint32(self.roi_names.index(name))) & 1 == 1
+
+    def evaluated(self, name, records=None):
+        """per record True if the rule of the joint was checked, e.g. False for the MAT_* bits without a yoga mat"""
+        records = self.records if records is None else records
+        return (records['evaluated'] >> np.uint32(self.roi_names.index(name))) & 1 == 1
+
+    def tipText(self, code):
+        return self.tips[code - 1] if code > 0 else ""
+
+    def failures(self, name, min_duration=0.0):
+        """(start, end) times of the spans where the joint failed, frames without a skeleton or where the rule was not checked do not count"""
+        failed = (~self.roi(name) & self.evaluated(name)).astype(np.int8)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], failed, [0]))))
+        t = self.records['t']
+        spans = []
+        for start, end in zip(edges[::2], edges[1::2]):
+            span = (float(t[start]), float(t[end - 1]))
+            if span[1] - span[0] >= min_duration:
+                spans.append(span)
+        return spans
+
+def openSessionLog(path, model):
+    """writer of a session log, append(t, point2d, point3d, detected) after each detection"""
+    return SessionWriter(path, model)
+
+def loadSessionLog(path):
+    return SessionLog(path)
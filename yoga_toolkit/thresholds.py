@@ -0,0 +1,144 @@
+import json
+
+'''
+Tunable angle thresholds of the pose rules in toolkit.py.
+THRESHOLDS[pose][name][kind] is the hand-picked default, name is an angle of AngleNodeDef
+or the angle without its side (e.g. 'ELBOW' for the side the rule checks), kind tells how the rule uses it:
+    'min': angle >= value
+    'max': angle <= value
+    'tolerance': sample angle - value <= angle <= sample angle + value
+    'lower_tolerance': angle >= sample angle - value
+    'upper_tolerance': angle <= sample angle + value
+A name of OFFSETS is not an angle but the distance between two landmarks along one axis of the world
+landmarks in cm, checked together with the angle of its joint.
+The rules read them with threshold(), values tuned by tune_thresholds.py are loaded from THRESHOLD_PATH.
+'''
+
+THRESHOLD_PATH = "yoga_toolkit/JsonFile/thresholds.json"
+
+THRESHOLDS = {
+    'Tree': {
+        'LEFT_KNEE': {'tolerance': 8},
+        'LEFT_HIP': {'tolerance': 8},
+        'RIGHT_KNEE': {'max': 65},
+        'RIGHT_KNEE_FORWARD': {'max': 17},
+        'RIGHT_HIP': {'min': 100},
+        'SHOULDER': {'min': 120},
+        'ELBOW': {'lower_tolerance': 10},
+    },
+    'WarriorII': {
+        'RIGHT_ANKLE': {'tolerance': 5},
+        'RIGHT_KNEE': {'min': 90, 'max': 150},
+        'RIGHT_KNEE_OVER_ANKLE': {'max': 10},
+        'LEFT_KNEE': {'lower_tolerance': 10},
+        'HIP': {'min': 100},
+        'SHOULDER': {'tolerance': 10},
+        'ELBOW': {'lower_tolerance': 5},
+    },
+    'Plank': {
+        'SHOULDER': {'tolerance': 10},
+        'HIP': {'tolerance': 5},
+        'KNEE': {'lower_tolerance': 5},
+        'ANKLE': {'min': 30},
+    },
+    'ReversePlank': {
+        'ELBOW': {'lower_tolerance': 10},
+        'WRIST': {'upper_tolerance': 10},
+        'SHOULDER': {'tolerance': 10},
+        'HIP': {'lower_tolerance': 5},
+        'KNEE': {'lower_tolerance': 10},
+    },
+    'Childs': {
+        'ELBOW': {'min': 150},
+        'SHOULDER': {'min': 150},
+        'HIP': {'tolerance': 10},
+        'KNEE': {'max': 45},
+    },
+    'DownwardDog': {
+        'ELBOW': {'min': 100},
+        'SHOULDER': {'min': 150},
+        'HIP': {'tolerance': 10},
+        'KNEE': {'min': 150},
+        'ANKLE': {'max': 180},
+    },
+    'LowLunge': {
+        'ELBOW': {'lower_tolerance': 10},
+        'SHOULDER': {'min': 150},
+        'HIP': {'max': 100},
+        # the front and back knee swap with the facing side, not tunable per angle
+        'FRONT_KNEE': {'max': 115},
+        'BACK_KNEE': {'min': 115},
+    },
+    'SeatedForwardBend': {
+        'SHOULDER': {'min': 90},
+        'HIP': {'tolerance': 20},
+        'KNEE': {'min': 150},
+        'ANKLE': {'max': 145},
+    },
+    'Bridge': {
+        'ELBOW': {'lower_tolerance': 25},
+        'KNEE': {'max': 80},
+        'SHOULDER': {'max': 45},
+        'HIP': {'min': 150},
+    },
+    'Pyramid': {
+        'ELBOW': {'min': 90},
+        'KNEE': {'lower_tolerance': 20},
+        'SHOULDER': {'min': 85},
+        'HIP': {'max': 110},
+        'LEG_ANKLE': {'max': 90},
+    },
+}
+
+# OFFSETS[pose][name] = (joint the rule marks, first landmark, second landmark, axis, absolute)
+# offset = (first - second) * 100 along axis (0 x, 1 y, 2 z) of the world landmarks, abs() of it if absolute
+OFFSETS = {
+    'Tree': {
+        # the raised knee may not come forward of the hip
+        'RIGHT_KNEE_FORWARD': ('RIGHT_KNEE', 'RIGHT_HIP', 'RIGHT_KNEE', 2, False),
+    },
+    'WarriorII': {
+        # the front knee stays above the ankle
+        'RIGHT_KNEE_OVER_ANKLE': ('RIGHT_KNEE', 'RIGHT_ANKLE', 'RIGHT_KNEE', 0, True),
+    },
+}
+
+_overrides = None
+
+def loadThresholds(path=THRESHOLD_PATH):
+    """read tuned values ({pose: {name: {kind: value}}}), missing file -> defaults only"""
+    global _overrides
+    try:
+        with open(path, 'r') as file:
+            _overrides = json.load(file)
+    except (OSError, ValueError):
+        _overrides = {}
+    return _overrides
+
+def threshold(pose, name, kind):
+    """tuned value of a threshold, the default of THRESHOLDS if it was not tuned"""
+    if _overrides is None:
+        loadThresholds()
+    value = _overrides.get(pose, {}).get(name, {}).get(kind)
+    if value is None:
+        return THRESHOLDS[pose][name][kind]
+    return value
+
+def angleNames(name, angle_def, pose=None):
+    """angles of angle_def a threshold name applies to, e.g. 'ELBOW' -> ['LEFT_ELBOW', 'RIGHT_ELBOW'], the joint of an offset of pose"""
+    if name in OFFSETS.get(pose, {}):
+        joint = OFFSETS[pose][name][0]
+        return [joint] if joint in angle_def else []
+    if name in angle_def:
+        return [name]
+    return [f"{side}_{name}" for side in ('LEFT', 'RIGHT') if f"{side}_{name}" in angle_def]
+
+def writeThresholds(values, path=THRESHOLD_PATH):
+    """merge values ({pose: {name: {kind: value}}}) into the tuned thresholds file"""
+    tuned = loadThresholds(path)
+    for pose, names in values.items():
+        for name, kinds in names.items():
+            tuned.setdefault(pose, {}).setdefault(name, {}).update(kinds)
+    with open(path, 'w') as file:
+        json.dump(tuned, file, indent=4)
+    loadThresholds(path)
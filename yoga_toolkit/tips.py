@@ -0,0 +1,91 @@
+import ast
+import os
+import yoga_toolkit.pressureRule as pressureRule
+
+'''
+Catalogue of every tip the application can say, used to pre-render speech and to store tips as codes.
+The tips are collected from the `tips = ...` assignments of the rule modules, so new rules are picked up automatically.
+'''
+
+RULE_FILES = ['toolkit.py', 'yogaPose.py']
+# f-string tips of the rules, e.g. f"請將{direction}手抬高"
+FORMAT_VALUES = {'direction': ["右", "左"]}
+
+UI_TIPS = [
+    "開始偵測...",
+    "請維持動作30秒，開始計時",
+    "練習結束，休息30秒",
+    "請調整瑜珈墊與鏡頭，使瑜珈墊放至框線當中",
+]
+
+def _expand(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, ast.IfExp):
+        return _expand(node.body) + _expand(node.orelse)
+    if isinstance(node, ast.JoinedStr):
+        texts = [""]
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts = [value.value]
+            elif isinstance(value, ast.FormattedValue) and isinstance(value.value, ast.Name) and value.value.id in FORMAT_VALUES:
+                parts = FORMAT_VALUES[value.value.id]
+            else:
+                return []
+            texts = [text + part for text in texts for part in parts]
+        return texts
+    return []
+
+def _is_tips(target):
+    return (isinstance(target, ast.Name) and target.id == 'tips') or (isinstance(target, ast.Attribute) and target.attr == 'tips')
+
+def collectRuleTips(path):
+    """collect the string tips assigned in a rule module
+
+    Args:
+        path (str): python file path
+
+    Returns:
+        tips (list) in source order
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        tree = ast.parse(file.read())
+    # ast.walk is breadth first, sorted by position the order is that of the source
+    assigns = [node for node in ast.walk(tree) if isinstance(node, ast.Assign) and any(_is_tips(target) for target in node.targets)]
+    tips = []
+    for node in sorted(assigns, key=lambda node: (node.lineno, node.col_offset)):
+        tips += _expand(node.value)
+    return tips
+
+_all_tips = None
+_codes = None
+
+def allTips():
+    """
+    every known tip without duplicates and empty strings, the index is the tip code
+    a new rule tip shifts the codes after it, the session logs and baselines store this table to decode their codes
+    """
+    global _all_tips, _codes
+    if _all_tips is None:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        tips = []
+        for file in RULE_FILES:
+            tips += collectRuleTips(os.path.join(folder, file))
+        for rule in pressureRule.POSE_PRESSURE.values():
+            tips += [check[3] for check in rule.values()]
+        tips += [pressureRule.EMPTY_MAT_TIP] + UI_TIPS
+        _all_tips = list(dict.fromkeys(tip for tip in tips if tip))
+        _codes = {tip: code + 1 for code, tip in enumerate(_all_tips)}
+    return _all_tips
+
+def tipCode(tip):
+    """code of a tip, 0 for no tip, -1 for an unknown tip"""
+    if not tip:
+        return 0
+    allTips()
+    return _codes.get(tip, -1)
+
+def tipText(code):
+    if code <= 0:
+        return ""
+    return allTips()[code - 1]
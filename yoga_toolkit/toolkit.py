@@ -1,44 +1,117 @@
-import mediapipe as mp
 import cv2
 import json
+import threading
+import numpy as np
 import math as m
+from collections import namedtuple
 import yoga_toolkit.AngleNodeDef as AngleNodeDef
+import yoga_toolkit.colorSpace as colorSpace
+from yoga_toolkit.thresholds import threshold
 
-mp_pose = mp.solutions.pose
-pose_connection = mp_pose.POSE_CONNECTIONS
-nodeList = mp.solutions.pose.PoseLandmark
-mp_sample_pose = mp_pose.Pose(static_image_mode=True,
-                                        model_complexity=2,
-                                        min_detection_confidence=0.5)
-mp_result_pose = mp_pose.Pose(static_image_mode=False,
-                                        model_complexity=2,
-                                        min_detection_confidence=0.5)
+# mediapipe args of the sample (image) and detect (video) models, also the key of the landmark cache
+SAMPLE_POSE_ARGS = dict(static_image_mode=True, model_complexity=2, min_detection_confidence=0.5)
+VIDEO_POSE_ARGS = dict(static_image_mode=False, model_complexity=2, min_detection_confidence=0.5)
+# mediapipe is imported and the shared sample / detect graphs are built on first use (or by warmUp),
+# so importing toolkit does not delay the start of the application
+_shared_models = {}
+_shared_lock = threading.Lock()
 
-def getMediapipeResult(frame, mode=True):
+def _mediapipePose():
+    import mediapipe as mp
+    return mp.solutions.pose
+
+def __getattr__(name):
+    """mp_pose, pose_connection, nodeList, mp_sample_pose and mp_result_pose, resolved on first access"""
+    if name == 'mp_pose':
+        return _mediapipePose()
+    if name == 'pose_connection':
+        return _mediapipePose().POSE_CONNECTIONS
+    if name == 'nodeList':
+        return _mediapipePose().PoseLandmark
+    if name in ('mp_sample_pose', 'mp_result_pose'):
+        return sharedPoseModel(name == 'mp_sample_pose')
+    raise AttributeError(f"module {__name__} has no attribute {name}")
+
+def createPoseModel(args=VIDEO_POSE_ARGS):
+    """own mediapipe Pose instance, e.g. one per camera so the video tracking state is not shared between streams"""
+    return _mediapipePose().Pose(**args)
+
+def _sharedModel(mode):
+    # called with _shared_lock held
+    if mode not in _shared_models:
+        _shared_models[mode] = createPoseModel(SAMPLE_POSE_ARGS if mode else VIDEO_POSE_ARGS)
+    return _shared_models[mode]
+
+def sharedPoseModel(mode):
+    """shared model of getMediapipeResult, mode True -> sample (image) model, False -> detect (video) model"""
+    with _shared_lock:
+        return _sharedModel(mode)
+
+def warmUp(mode=False):
+    """build the shared model and run one dummy inference, the first real frame then has no initialization spike"""
+    with _shared_lock:
+        # the lock is held until the dummy inference is done, a detect started meanwhile waits for it
+        _sharedModel(mode).process(np.zeros((256, 256, 3), dtype=np.uint8))
+
+# stand-in for a mediapipe landmark, built from stored landmark arrays
+Landmark = namedtuple('Landmark', ['x', 'y', 'z', 'visibility'])
+
+def getMediapipeResult(frame, mode=True, model=None):
     """Get mediapipe result of this frame
 
     Args:
-        frame (image array):  process frame
+        frame (image array):  process frame, colorSpace.Frame or BGR array
         mode (bool): set mediapipe args [static_image_mode]
             True -> use to different image
             False -> use to video
+        model (mediapipe Pose): optional own model (createPoseModel), used instead of the shared ones
 
     Returns:
         2D & 3D result of mediapipe
         (if process error return 0,0)
 
     """
+    image = colorSpace.toArray(frame, colorSpace.RGB)
+    # outside of the try, a failing first import of mediapipe is not a frame without a skeleton
+    if model is None:
+        model = sharedPoseModel(mode)
     try:
-        if mode:
-            results = mp_sample_pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        else:
-            results = mp_result_pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        results = model.process(image)
         point2d = results.pose_landmarks.landmark
         point3d = results.pose_world_landmarks.landmark
         return point2d, point3d
     except:
         return 0, 0
 
+def mirrorResize(frame, w, h, dst=None, mirror=True):
+    """resize frame to (w, h) and mirror it horizontally in one pass over the pixels
+
+    Args:
+        frame (image array): source frame
+        w (int): output w
+        h (int): output h
+        dst (image array): optional output buffer of shape (h, w, channels)
+        mirror (bool): mirror horizontally
+
+    Returns:
+        resized frame (dst if given)
+    """
+    frame_h, frame_w = frame.shape[:2]
+    if (frame_w, frame_h) == (w, h):
+        if mirror:
+            return cv2.flip(frame, 1, dst=dst)
+        if dst is None:
+            return frame.copy()
+        np.copyto(dst, frame)
+        return dst
+    sx, sy = w / frame_w, h / frame_h
+    # same pixel centre mapping as cv2.resize, mirrored: x' = w - 1 - x
+    if mirror:
+        matrix = np.float32([[-sx, 0, w - 0.5 - 0.5 * sx], [0, sy, 0.5 * sy - 0.5]])
+    else:
+        matrix = np.float32([[sx, 0, 0.5 * sx - 0.5], [0, sy, 0.5 * sy - 0.5]])
+    return cv2.warpAffine(frame, matrix, (w, h), dst=dst, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
 def getLandmarks(landmark, w=None, h=None):
     """Get skeleton landmark x,y,z respectively
     
@@ -56,6 +129,14 @@ def getLandmarks(landmark, w=None, h=None):
     else:
         return int(landmark.x*w), int(landmark.y*h)
 
+def landmarksToArray(landmarks):
+    """mediapipe landmark list -> (33, 4) float32 array of x, y, z, visibility"""
+    return np.array([(landmark.x, landmark.y, landmark.z, landmark.visibility) for landmark in landmarks], dtype=np.float32)
+
+def landmarksFromArray(array):
+    """(33, 4) array -> list of Landmark, usable by the rules and draw like a mediapipe landmark list"""
+    return [Landmark(*row) for row in array.tolist()]
+
 def readSampleJsonFile(path):
     """read joint angle sample json file
     
@@ -147,7 +228,7 @@ def treePoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
         if tips == "":
             tip_flag = True
         if key == 'LEFT_KNEE' or key == 'LEFT_HIP':
-            tolerance_val = 8
+            tolerance_val = threshold('Tree', key, 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             if angle_dict[key]>=min_angle and angle_dict[key]<=max_angle:
@@ -170,31 +251,33 @@ def treePoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
         elif key == 'RIGHT_KNEE':
             _,_,knee_z = getLandmarks(point3d[AngleNodeDef.RIGHT_KNEE])
             _,_,hip_z = getLandmarks(point3d[AngleNodeDef.RIGHT_HIP])
-            if angle_dict[key]<=65 and ((hip_z-knee_z)*100)<=17:
+            max_angle = threshold('Tree', 'RIGHT_KNEE', 'max')
+            max_forward = threshold('Tree', 'RIGHT_KNEE_FORWARD', 'max')
+            if angle_dict[key]<=max_angle and ((hip_z-knee_z)*100)<=max_forward:
                 roi[key] = True
-            elif angle_dict[key]>65:
+            elif angle_dict[key]>max_angle:
                 roi[key] = False
                 tips = "請將右腳再抬高一些，不可壓到左腳膝蓋" if tip_flag else tips
-            elif ((hip_z-knee_z)*100)>17:
+            elif ((hip_z-knee_z)*100)>max_forward:
                 roi[key] = False
                 tips = "將臂部往前推，打開左右骨盆，右腳膝蓋不可向前傾" if tip_flag else tips
             else:
                 roi[key] = False
                 tips = "右腳膝蓋不可向前傾，須與髖關節保持同一平面" if tip_flag else tips
         elif key == 'RIGHT_HIP':
-            if angle_dict[key]>=100:
+            if angle_dict[key]>=threshold('Tree', 'RIGHT_HIP', 'min'):
                 roi[key] = True
             else:
                 roi[key] = False
                 tips = "請確認右腳膝蓋是否已經抬至左腳膝蓋以上" if tip_flag else tips
         elif key == 'LEFT_SHOULDER' or key == 'RIGHT_SHOULDER':
-            if angle_dict[key]>=120:
+            if angle_dict[key]>=threshold('Tree', 'SHOULDER', 'min'):
                 roi[key] = True
             else:
                 roi[key] = False
                 tips = "請將雙手合掌並互相施力，往上伸展至頭頂正上方" if tip_flag else tips
         elif key == 'LEFT_ELBOW' or key == 'RIGHT_ELBOW':
-            tolerance_val = 10
+            tolerance_val = threshold('Tree', 'ELBOW', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             if angle_dict[key]>=min_angle:
                 roi[key] = True
@@ -247,7 +330,7 @@ def warriorIIPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
             tip_flag = True
             # imagePath = f"{imageFolder}/8.JPG"
         if key == 'RIGHT_ANKLE': #1
-            tolerance_val = 5
+            tolerance_val = threshold('WarriorII', 'RIGHT_ANKLE', 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             if angle_dict[key]>=min_angle and angle_dict[key]<=max_angle:
@@ -260,23 +343,26 @@ def warriorIIPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
         elif key == 'RIGHT_KNEE': #2
             ankle_x,_,_ = getLandmarks(point3d[AngleNodeDef.RIGHT_ANKLE])
             knee_x,_,_ = getLandmarks(point3d[AngleNodeDef.RIGHT_KNEE])
-            if angle_dict[key]>=90 and angle_dict[key]<=150 and abs((ankle_x-knee_x)*100)<=10:
+            min_angle = threshold('WarriorII', 'RIGHT_KNEE', 'min')
+            max_angle = threshold('WarriorII', 'RIGHT_KNEE', 'max')
+            max_offset = threshold('WarriorII', 'RIGHT_KNEE_OVER_ANKLE', 'max')
+            if angle_dict[key]>=min_angle and angle_dict[key]<=max_angle and abs((ankle_x-knee_x)*100)<=max_offset:
                 roi[key] = True
                 imagePath = f"{imageFolder}/8.JPG" if tip_flag else imagePath
-            elif abs((ankle_x-knee_x)*100)>10:
+            elif abs((ankle_x-knee_x)*100)>max_offset:
                 roi[key] = False
                 tips = "請將右腳膝蓋往右腳腳踝的方向移動，直到小腿與地面呈垂直" if tip_flag else tips
                 imagePath = f"{imageFolder}/2.JPG" if tip_flag else imagePath
-            elif angle_dict[key]<90:
+            elif angle_dict[key]<min_angle:
                 roi[key] = False
                 tips = "臀部不可低於右腳膝蓋，請將左腳往內收回使臀部高於右腳膝蓋" if tip_flag else tips
                 imagePath = f"{imageFolder}/2.JPG" if tip_flag else imagePath
-            elif angle_dict[key]>150:
+            elif angle_dict[key]>max_angle:
                 roi[key] = False
                 tips = "請將左腳再往後一些，讓臀部有空間可以下壓" if tip_flag else tips
                 imagePath = f"{imageFolder}/2.JPG" if tip_flag else imagePath
         elif key == 'LEFT_KNEE': #3
-            tolerance_val = 10
+            tolerance_val = threshold('WarriorII', 'LEFT_KNEE', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             # if angle_dict[key]>=min_angle and angle_dict[key]<=max_angle:
@@ -288,7 +374,7 @@ def warriorIIPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將左腳膝蓋打直，並將左腳腳尖朝向前方" if tip_flag else tips
                 imagePath = f"{imageFolder}/3.JPG" if tip_flag else imagePath
         elif key == 'LEFT_HIP' or key == 'RIGHT_HIP': #4
-            if angle_dict[key]>=100:
+            if angle_dict[key]>=threshold('WarriorII', 'HIP', 'min'):
                 roi[key] = True
                 imagePath = f"{imageFolder}/8.JPG" if tip_flag else imagePath
             else:
@@ -307,7 +393,7 @@ def warriorIIPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將頭轉向彎曲腳的方向並直視前方" if tip_flag else tips
                 imagePath = f"{imageFolder}/5.JPG" if tip_flag else imagePath
         elif key == 'LEFT_SHOULDER' or key == 'RIGHT_SHOULDER': #6
-            tolerance_val = 10
+            tolerance_val = threshold('WarriorII', 'SHOULDER', 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             direction = "右" if key == 'RIGHT_SHOULDER' else "左"
@@ -323,7 +409,7 @@ def warriorIIPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = f"請將{direction}手放低，與肩膀呈水平，\n並將身體挺直朝向前方" if tip_flag else tips
                 imagePath = f"{imageFolder}/6.JPG" if tip_flag else imagePath
         elif key == 'LEFT_ELBOW' or key == 'RIGHT_ELBOW': #7
-            tolerance_val = 5
+            tolerance_val = threshold('WarriorII', 'ELBOW', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             direction = "右" if key == 'RIGHT_ELBOW' else "左"
@@ -403,7 +489,7 @@ def plankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                     tips = "請將手肘向前移並確認手肘位置在肩關節下方"
 
         elif key == side + 'SHOULDER':
-            tolerance_val = 10
+            tolerance_val = threshold('Plank', 'SHOULDER', 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             if angle_dict[key]>=min_angle and angle_dict[key]<=max_angle:
@@ -418,7 +504,7 @@ def plankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                     tips = "請將手肘向後縮並維持頸椎、胸椎、腰椎維持一直線平行於地面"
 
         elif key == side + 'HIP':
-            tolerance_val = 5
+            tolerance_val = threshold('Plank', 'HIP', 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             if angle_dict[key]>=min_angle and angle_dict[key]<=max_angle:
@@ -434,7 +520,7 @@ def plankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將屁股稍微抬起"
 
         elif key == side + 'KNEE':
-            tolerance_val = 5
+            tolerance_val = threshold('Plank', 'KNEE', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             if angle_dict[key]>=min_angle:
                 roi['RIGHT_KNEE'] = True
@@ -445,8 +531,7 @@ def plankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將腳向前移，膝蓋伸直並讓腳踝到膝蓋成一直線"
 
         elif key == side + 'ANKLE':
-            tolerance_val = 15
-            min_angle = 30
+            min_angle = threshold('Plank', 'ANKLE', 'min')
             if angle_dict[key]>=min_angle:
                 roi['RIGHT_ANKLE'] = True
                 roi['LEFT_ANKLE'] = True
@@ -493,7 +578,7 @@ def reversePlankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將身體面向右方或左方坐下，並將雙手撐在肩膀下方，\n使上半身呈現斜線" if tip_flag else tips
                 break
         if key == f"{side}_ELBOW":
-            tolerance_val = 10
+            tolerance_val = threshold('ReversePlank', 'ELBOW', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             # min_angle = sample_angle_dict[f"{sample_side}_ELBOW"]-tolerance_val
             # max_angle = sample_angle_dict[f"{sample_side}_ELBOW"]+tolerance_val
@@ -521,7 +606,7 @@ def reversePlankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_INDEX"] = False
                 tips = "請將雙手手指朝向臀部，並將手臂打直，垂直於地面" if tip_flag else tips
         elif key == f"{side}_WRIST":
-            tolerance_val = 10
+            tolerance_val = threshold('ReversePlank', 'WRIST', 'upper_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             # min_angle = sample_angle_dict[f"{sample_side}_WRIST"]-tolerance_val
@@ -535,7 +620,7 @@ def reversePlankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_WRIST"] = False
                 tips = "請將手掌平貼於地面，\n讓肩膀、手軸、手腕成一直線垂直於地面" if tip_flag else tips
         elif key == f"{side}_SHOULDER":
-            tolerance_val = 10
+            tolerance_val = threshold('ReversePlank', 'SHOULDER', 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             # min_angle = sample_angle_dict[f"{sample_side}_SHOULDER"]-tolerance_val
@@ -548,7 +633,7 @@ def reversePlankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_SHOULDER"] = False
                 tips = "將臀部抬起，胸往前挺，使脊椎保持一直線" if tip_flag else tips
         elif key == f"{side}_HIP":
-            tolerance_val = 5
+            tolerance_val = threshold('ReversePlank', 'HIP', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             # min_angle = sample_angle_dict[f"{sample_side}_HIP"]-tolerance_val
@@ -561,7 +646,7 @@ def reversePlankPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_HIP"] = False
                 tips = "請將臀部抬高一些，使身體保持一直線" if tip_flag else tips
         elif key == f"{side}_KNEE":
-            tolerance_val = 10
+            tolerance_val = threshold('ReversePlank', 'KNEE', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             # min_angle = sample_angle_dict[f"{sample_side}_KNEE"]-tolerance_val
@@ -610,7 +695,7 @@ def ChildsPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將身體面向右方或左方趴下，並用雙手將臀部向前伸直" if tip_flag else tips
                 break
         if key == f'{side}_ELBOW':
-            if angle_dict[key]>=150:
+            if angle_dict[key]>=threshold('Childs', 'ELBOW', 'min'):
                 roi["LEFT_ELBOW"] = True
                 roi["RIGHT_ELBOW"] = True
             else:
@@ -618,7 +703,7 @@ def ChildsPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_ELBOW"] = False
                 tips = "請確認手掌是否已經貼至地面"   if tip_flag else tips
         elif key == f'{side}_SHOULDER':
-            if angle_dict[key]>=150:
+            if angle_dict[key]>=threshold('Childs', 'SHOULDER', 'min'):
                 roi["LEFT_SHOULDER"] = True
                 roi["RIGHT_SHOULDER"] = True
             else:
@@ -626,7 +711,7 @@ def ChildsPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_SHOULDER"] = False
                 tips = "請確認是否已經將手臂向前伸直" if tip_flag else tips
         elif key == f'{side}_HIP':
-            tolerance_val = 10
+            tolerance_val = threshold('Childs', 'HIP', 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             if angle_dict[key]<=max_angle and min_angle<=angle_dict[key]:
@@ -637,7 +722,7 @@ def ChildsPoseRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_HIP"] = False
                 tips = "請確認是否已經將身體向前趴下" if tip_flag else tips	
         elif key == f'{side}_KNEE':
-            if angle_dict[key]<=45:
+            if angle_dict[key]<=threshold('Childs', 'KNEE', 'max'):
                 roi["LEFT_KNEE"] = True
                 roi["RIGHT_KNEE"] = True
             else:
@@ -681,7 +766,7 @@ def DownwardDogRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將身體面向右方或左方，並用雙手將臀部向上撐起成倒V字型" if tip_flag else tips
                 break
         if key == f'{side}_ELBOW':
-            if angle_dict[key]>=100:
+            if angle_dict[key]>=threshold('DownwardDog', 'ELBOW', 'min'):
                 roi["LEFT_ELBOW"] = True
                 roi["RIGHT_ELBOW"] = True
             else:
@@ -689,7 +774,7 @@ def DownwardDogRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_ELBOW"] = False
                 tips = "請確認手掌是否已經貼至地面"   if tip_flag else tips
         elif key == f'{side}_SHOULDER':
-            if angle_dict[key]>=150:
+            if angle_dict[key]>=threshold('DownwardDog', 'SHOULDER', 'min'):
                 roi["LEFT_SHOULDER"] = True
                 roi["RIGHT_SHOULDER"] = True
             else:
@@ -697,7 +782,7 @@ def DownwardDogRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_SHOULDER"] = False
                 tips = "請確認是否已經將手臂打直" if tip_flag else tips	
         elif key == f'{side}_HIP':
-            tolerance_val = 10
+            tolerance_val = threshold('DownwardDog', 'HIP', 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             if angle_dict[key]>=min_angle and angle_dict[key]<=max_angle:
@@ -708,7 +793,7 @@ def DownwardDogRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_HIP"] = False
                 tips = "請確認是否已經將身體向下伸展且把背打直, 呈現倒v字型" if tip_flag else tips	
         elif key == f'{side}_KNEE':
-            if angle_dict[key]>=150:
+            if angle_dict[key]>=threshold('DownwardDog', 'KNEE', 'min'):
                 roi["LEFT_KNEE"] = True
                 roi["RIGHT_KNEE"] = True
             else:
@@ -716,7 +801,7 @@ def DownwardDogRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_KNEE"] = False
                 tips = "請確認雙腿是否已經打直" if tip_flag else tips	
         elif key == f'{side}_ANKLE':
-            if angle_dict[key]<=180:
+            if angle_dict[key]<=threshold('DownwardDog', 'ANKLE', 'max'):
                 roi["LEFT_ANKLE"] = True
                 roi["RIGHT_ANKLE"] = True
             else:
@@ -764,7 +849,7 @@ def LowLungeRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將身體面向右方或左方，並將雙手向上舉起" if tip_flag else tips
                 break
         if key == f'{side}_ELBOW':
-            tolerance_val = 10
+            tolerance_val = threshold('LowLunge', 'ELBOW', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             if angle_dict[key]>=min_angle:
                 roi["LEFT_ELBOW"] = True
@@ -774,7 +859,7 @@ def LowLungeRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_ELBOW"] = False
                 tips = "請確認手掌是否已經舉高過頭"   if tip_flag else tips
         elif key == f'{side}_SHOULDER':
-            if angle_dict[key]>=150:
+            if angle_dict[key]>=threshold('LowLunge', 'SHOULDER', 'min'):
                 roi["LEFT_SHOULDER"] = True
                 roi["RIGHT_SHOULDER"] = True
             else:
@@ -782,20 +867,20 @@ def LowLungeRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_SHOULDER"] = False
                 tips = "請確認是否已經將手臂打直" if tip_flag else tips
         elif key == f'{side}_HIP':
-            if angle_dict[key]<=100:
+            if angle_dict[key]<=threshold('LowLunge', 'HIP', 'max'):
                 roi[f"{side}_HIP"] = True
             else:
                 roi[f"{side}_HIP"] = False
                 tips = "請確認是否已經將重心壓低" if tip_flag else tips
         elif key == f'{side}_KNEE':
-            if angle_dict[key]<=115:
+            if angle_dict[key]<=threshold('LowLunge', 'FRONT_KNEE', 'max'):
                 roi[f"{side}_KNEE"] = True
             else:
                 #print(f"{side}_KNEE: ",angle_dict[key])
                 roi[f"{side}_KNEE"] = False
                 tips = "請確認是否已經將其中一只腳屈膝" if tip_flag else tips
         elif key == f"{side_back}_KNEE":
-            if angle_dict[key]>=115:
+            if angle_dict[key]>=threshold('LowLunge', 'BACK_KNEE', 'min'):
                 roi[f"{side_back}_KNEE"] = True
             else:
                 roi[f"{side_back}_KNEE"] = False
@@ -839,7 +924,7 @@ def SeatedForwardBendRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將身體面向右方或左方坐下，並將腳伸直" if tip_flag else tips
                 break
         elif key == f'{side}_SHOULDER':
-            if angle_dict[key]>=90:
+            if angle_dict[key]>=threshold('SeatedForwardBend', 'SHOULDER', 'min'):
                 roi["LEFT_SHOULDER"] = True
                 roi["RIGHT_SHOULDER"] = True
             else:
@@ -847,7 +932,7 @@ def SeatedForwardBendRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_SHOULDER"] = False
                 tips = "請確認是否已經將手臂向前伸" if tip_flag else tips
         elif key == f'{side}_HIP':
-            tolerance_val = 20
+            tolerance_val = threshold('SeatedForwardBend', 'HIP', 'tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             max_angle = sample_angle_dict[key]+tolerance_val
             if angle_dict[key]<=max_angle and min_angle<=angle_dict[key]:
@@ -858,7 +943,7 @@ def SeatedForwardBendRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_HIP"] = False
                 tips = "請確認是否已經將身體向前彎，盡量碰觸到腳板" if tip_flag else tips
         elif key == f'{side}_KNEE':
-            if angle_dict[key]>=150:
+            if angle_dict[key]>=threshold('SeatedForwardBend', 'KNEE', 'min'):
                 roi["LEFT_KNEE"] = True
                 roi["RIGHT_KNEE"] = True
             else:
@@ -866,7 +951,7 @@ def SeatedForwardBendRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_KNEE"] = False
                 tips = "請確認是否已經將雙腳向前伸直" if tip_flag else tips
         elif key == f"{side}_ANKLE":
-            if angle_dict[key]<=145:
+            if angle_dict[key]<=threshold('SeatedForwardBend', 'ANKLE', 'max'):
                 roi["LEFT_ANKLE"] = True
                 roi["RIGHT_ANKLE"] = True
             else:
@@ -911,7 +996,7 @@ def BridgeRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將身體平躺下，並將雙手放置於身體兩側" if tip_flag else tips
                 break
         if key == f'{side}_ELBOW':
-            tolerance_val = 25
+            tolerance_val = threshold('Bridge', 'ELBOW', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             if angle_dict[key]>=min_angle:
                 roi["LEFT_ELBOW"] = True
@@ -922,7 +1007,7 @@ def BridgeRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 #print(angle_dict[key])
                 tips = "請確認手掌是否已經貼至地面"   if tip_flag else tips
         elif key == f'{side}_KNEE':
-            if angle_dict[key]<=80:
+            if angle_dict[key]<=threshold('Bridge', 'KNEE', 'max'):
                 roi["LEFT_KNEE"] = True
                 roi["RIGHT_KNEE"] = True
             else:
@@ -930,7 +1015,7 @@ def BridgeRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_KNEE"] = False
                 tips = "請確認是否已經將雙腳屈膝" if tip_flag else tips
         elif key == f'{side}_SHOULDER':
-            if angle_dict[key]<=45:
+            if angle_dict[key]<=threshold('Bridge', 'SHOULDER', 'max'):
                 roi["LEFT_SHOULDER"] = True
                 roi["RIGHT_SHOULDER"] = True
             else:
@@ -938,7 +1023,7 @@ def BridgeRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_SHOULDER"] = False
                 tips = "請確認是否已經將手臂放置於身體兩側" if tip_flag else tips
         elif key == f'{side}_HIP':
-            if angle_dict[key]>=150:
+            if angle_dict[key]>=threshold('Bridge', 'HIP', 'min'):
                 roi["LEFT_HIP"] = True
                 roi["RIGHT_HIP"] = True
             else:
@@ -983,7 +1068,7 @@ def PyramidRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 tips = "請將雙腿呈現弓箭步姿，並將身體向前腳彎曲" if tip_flag else tips
                 break
         if key == f'{side}_ELBOW':
-            if angle_dict[key]>=90:
+            if angle_dict[key]>=threshold('Pyramid', 'ELBOW', 'min'):
                 roi["LEFT_ELBOW"] = True
                 roi["RIGHT_ELBOW"] = True
             else:
@@ -992,7 +1077,7 @@ def PyramidRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 #print(angle_dict[key])
                 tips = "請確認手掌是否已經抓到腳踝"   if tip_flag else tips
         elif key == f'{side}_KNEE':
-            tolerance_val = 20
+            tolerance_val = threshold('Pyramid', 'KNEE', 'lower_tolerance')
             min_angle = sample_angle_dict[key]-tolerance_val
             if angle_dict[key]>=min_angle:
                 roi["LEFT_KNEE"] = True
@@ -1003,7 +1088,7 @@ def PyramidRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 #print(angle_dict[key])
                 tips = "請確認是否已經將雙腳打直" if tip_flag else tips
         elif key == f'{side}_SHOULDER':
-            if angle_dict[key]>=85:
+            if angle_dict[key]>=threshold('Pyramid', 'SHOULDER', 'min'):
                 roi["LEFT_SHOULDER"] = True
                 roi["RIGHT_SHOULDER"] = True
             else:
@@ -1011,7 +1096,7 @@ def PyramidRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_SHOULDER"] = False
                 tips = "請確認是否已經將手臂放置於前腳兩側" if tip_flag else tips
         elif key == f'{side}_HIP':
-            if angle_dict[key]<=110:
+            if angle_dict[key]<=threshold('Pyramid', 'HIP', 'max'):
                 roi["LEFT_HIP"] = True
                 roi["RIGHT_HIP"] = True
             else:
@@ -1020,7 +1105,7 @@ def PyramidRule(roi, tips, sample_angle_dict, angle_dict, point3d):
                 roi["RIGHT_HIP"] = False
                 tips = "請確認是否已經將身體向前腳彎曲" if tip_flag else tips
         elif key == 'LEG_ANKLE':
-            if angle_dict[key]<=90:
+            if angle_dict[key]<=threshold('Pyramid', 'LEG_ANKLE', 'max'):
                 roi["LEG"] = True
             else:
                 roi["LEG"] = False
@@ -1,6 +1,10 @@
+import os
 import yoga_toolkit.toolkit as toolkit
+import yoga_toolkit.landmarkCache as landmarkCache
 import cv2
 import yoga_toolkit.AngleNodeDef as AngleNodeDef
+import yoga_toolkit.pressureRule as pressureRule
+import yoga_toolkit.colorSpace as colorSpace
 import numpy as np
 
 class YogaPose():
@@ -14,6 +18,16 @@ class YogaPose():
         self.angle_dict = self.initialAngleDict()
         self.sample_angle_dict = {}
         self.imagePath = "./data/image/WarriorIIRulePic/8.JPG" # temporary use to demo, skip it
+        # landmark index of the roi joints, used to draw them in one array operation
+        self.roi_names = [name for name in self.roi if name in toolkit.nodeList.__members__]
+        self.roi_index = np.array([toolkit.nodeList[name].value for name in self.roi_names], dtype=int)
+        self.overlay = [None] * 3
+        self.overlay_index = 0
+        # last evaluated mediapipe result
+        self.point2d, self.point3d = 0, 0
+        self.detected = False
+        # own mediapipe model (toolkit.createPoseModel), None -> the shared model of toolkit
+        self.pose_model = None
         
     def initialize(self, type):
         roi = {}
@@ -215,7 +229,28 @@ class YogaPose():
 
         return roi, angle_def, jsonfile_path, samplefile_path
     
-    def initialAngleDict(self, dict={}):
+    def reset(self):
+        '''
+        clear the result of the last detection, used when the model is reused for a new practice
+        '''
+        for key in self.roi:
+            self.roi[key] = False
+        self.tips = ""
+        self.imagePath = "./data/image/WarriorIIRulePic/8.JPG"
+
+    def hintImagePaths(self):
+        '''
+        all images detect may set to imagePath, used to preload them
+        '''
+        paths = [self.imagePath]
+        if self.type == 'WarriorII':
+            paths += [f"./data/image/WarriorIIRulePic/{i}.JPG" for i in range(1, 9)]
+        return paths
+
+    def initialAngleDict(self, dict=None):
+        # a new dict per pose, a shared default would share the angles of every YogaPose
+        if dict is None:
+            dict = {}
         index = 0
         for key,_ in self.angle_def.items():
             dict[key] = 0
@@ -235,18 +270,14 @@ class YogaPose():
         '''
         print(f"Sampling {video_path}...")
         sum_angle = np.zeros(len(self.angle_def))
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
+        if not os.path.exists(video_path):
             print("Video not open")
             exit()
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # landmarks of the reference video are cached, re-sampling skips the inference
+        landmarks, meta = landmarkCache.load(video_path, toolkit.SAMPLE_POSE_ARGS)
+        frame_count = meta['frames']
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Sample Video end")
-                break
-            point2d, point3d = toolkit.getMediapipeResult(frame)
+        for point2d, point3d in landmarkCache.results(landmarks):
             if type(point3d) == int:
                 print("sample video detect pose error")
                 break
@@ -270,26 +301,52 @@ class YogaPose():
                     perFrameOfAngle.append(angle)
             sum_angle+=perFrameOfAngle
             print(perFrameOfAngle)
-            cv2.imshow('sample', self.draw(frame.shape[1], frame.shape[0], frame, point2d))
-            cv2.waitKey(1)
         print(sum_angle/frame_count) # 平均角度
         sum_angle/=frame_count
         toolkit.writeSampleJsonFile(sum_angle, self.angle_def, storage_path)
         print("Sample Done.")
-        cap.release()
         
-    def detect(self, frame, w, h, mode):
+    def detect(self, frame, w, h, mode, mat_feature=None, mirror=True):
         '''
         detect incoming frame
-        return draw frame
+        frame: colorSpace.Frame, or a BGR array as read by OpenCV
+        mat_feature: yogamat.MatFeature aligned with this frame, None if the yoga mat is not used
+        mirror: mirror the returned frame horizontally
+        return draw frame, resized to w, h: an RGB Frame for a Frame, a BGR array for an array
+        '''
+        source = frame
+        # converted once, mediapipe and the drawing share the RGB frame
+        frame = colorSpace.asFrame(frame).to(colorSpace.RGB)
+        if not self.analyse(frame, mode, mat_feature):
+            return colorSpace.like(colorSpace.Frame(self.draw(w, h, frame.image, None, mirror), colorSpace.RGB), source)
+
+        frame = colorSpace.Frame(self.draw(w, h, frame.image, self.point2d, mirror), colorSpace.RGB)
+        return colorSpace.like(frame, source)
+
+    def analyse(self, frame, mode, mat_feature=None):
+        '''
+        inference and rules of detect without drawing, e.g. for the inference workers of StationManager
+        frame: colorSpace.Frame, or a BGR array
+        return False if there is no skeleton to evaluate
+        '''
+        point2d, point3d = toolkit.getMediapipeResult(frame, mode, self.pose_model)
+        if not self.evaluate(point2d, point3d):
+            return False
+        self.evaluatePressure(mat_feature)
+        return True
+    
+    def evaluate(self, point2d, point3d):
+        '''
+        run the angle rules of this pose on one mediapipe result, sets angle_dict, roi, tips (and imagePath)
+        point2d, point3d: mediapipe landmark lists, 0 when nothing was detected, kept as the last result
+        return False if there is no skeleton to evaluate
         '''
         self.tips = ""
-        point2d, point3d = toolkit.getMediapipeResult(frame, mode)
-        if type(point2d) == int and type(point3d) == int:
+        self.point2d, self.point3d = point2d, point3d
+        self.detected = not (type(point2d) == int and type(point3d) == int)
+        if not self.detected:
             self.tips = "無法偵測到完整骨架"
-            # 水平翻轉影片
-            frame = cv2.flip(frame, 180)
-            return frame
+            return False
         # for key,value in self.angle_def.items():
         #     angle = toolkit.computeAngle(list(toolkit.getLandmarks(point3d[value[0]])), 
         #                             list(toolkit.getLandmarks(point3d[value[1]])), 
@@ -367,42 +424,53 @@ class YogaPose():
                                         list(toolkit.getLandmarks(point3d[value[2]])))
                 self.angle_dict[key] = angle
             self.roi, self.tips = toolkit.PyramidRule(self.roi, self.tips, self.sample_angle_dict, self.angle_dict, point3d)
+        return True
+
+    def evaluatePressure(self, mat_feature):
+        '''
+        merge the pressure rule into the result of evaluate
+        mat_feature: yogamat.MatFeature aligned with the frame, None -> the MAT_* roi keys are removed
+        '''
+        pressure_rule = pressureRule.POSE_PRESSURE[self.type]
+        if mat_feature is not None:
+            self.roi, self.tips = pressureRule.pressureRule(self.roi, self.tips, mat_feature, pressure_rule)
+        else:
+            for key in pressure_rule:
+                self.roi.pop(key, None)
+
+    def nextOverlay(self, w, h):
+        '''
+        reused output buffers, a few of them so the UI can still draw the previous frame
+        '''
+        self.overlay_index = (self.overlay_index + 1) % len(self.overlay)
+        buffer = self.overlay[self.overlay_index]
+        if buffer is None or buffer.shape[:2] != (h, w):
+            buffer = np.empty((h, w, 3), np.uint8)
+            self.overlay[self.overlay_index] = buffer
+        return buffer
+
+    def draw(self, w, h, frame, point2d, mirror=True):
+        '''
+        resize (and mirror) frame to w, h in one pass and mark the wrong roi joints
+        point2d: mediapipe 2D result, None -> only resize
+        '''
+        overlay = toolkit.mirrorResize(frame, w, h, self.nextOverlay(w, h), mirror)
+        if point2d is None:
+            return overlay
+
+        # draw points of the wrong roi joints, mirrored in coordinate space
+        wrong = np.array([not self.roi[name] for name in self.roi_names], dtype=bool)
+        if wrong.any():
+            points = (np.array([(point2d[i].x, point2d[i].y) for i in self.roi_index[wrong]]) * (w, h)).astype(int)
+            if mirror:
+                points[:, 0] = w - 1 - points[:, 0]
+            for x, y in points.tolist():
+                cv2.circle(overlay, (x, y), 7, (255,0,0), 4)
 
-        frame = self.draw(w, h, frame, point2d)
-        return frame
-    
-    def draw(self, w, h, frame, point2d):
-        # draw body connection
-        # for m in toolkit.pose_connection:
-        #     cv2.line(frame, toolkit.getLandmarks(point2d[m[0]], w, h), list(toolkit.getLandmarks(point2d[m[1]], w, h)), (0, 0, 255), 1)
-        
-        # draw points
-        point_color = (0,0,0)
-        for node in toolkit.nodeList:
-            point = toolkit.getLandmarks(point2d[node.value], w, h)
-            if node.name in self.roi:
-                if self.roi[node.name]:
-                    point_color = (0,255,0)
-                else:
-                    point_color = (255,0,0)
-                    cv2.circle(frame, point, 7, point_color, 4)
-            # else:
-            #     point_color = (255,255,255)
-            
-            # draw result angle
-            # if node.name in self.angle_def:
-            #     text_size, _ = cv2.getTextSize(str(round(self.angle_dict[node.name], 1)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-            #     cv2.putText(frame, str(round(self.angle_dict[node.name], 1)), (point[0]-text_size[0]//2, point[1]), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (6, 211, 255), 1)
-            
-            # cv2.circle(frame, point, 3, point_color, -1)
-        
         # draw sample angle
         # draw_y = 30
         # for key, value in self.sample_angle_dict.items():
         #     text = f"{key}: {value}"
         #     cv2.putText(frame, text, (10, draw_y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (6, 211, 255), 1)
         #     draw_y+=20
-        
-        # 水平翻轉影片
-        frame = cv2.flip(frame, 180)
-        return frame
\ No newline at end of file
+        return overlay
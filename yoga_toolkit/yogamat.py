@@ -1,39 +1,207 @@
 import serial
+import threading
+import time
+from collections import deque
 import cv2
 import numpy as np
+from yoga_toolkit.recordLog import RecordWriter, RecordReader
 
 serial_port = 'COM3'
 baud_rate = 115200
 enlarge = 50
-ser = serial.Serial(serial_port, baud_rate)    
+frame_size = 237
 header = r"00fe80b7"
 tail = r"ffff68ff"
+# one raw grid per record in the session mat log, 224 bytes
+MAT_RECORD = np.dtype([('t', '<f8'), ('grid', 'u1', (12, 18))])
 
-def get_yoga_mat_data():
-    data = ['']
-    pre_data = ""
-    next_data = ""
+def open_mat_log(path):
+    """writer of a session mat log, append(t, raw_grid) with time.monotonic() timestamps"""
+    return RecordWriter(path, MAT_RECORD, meta={'type': 'yogamat'})
 
+def load_mat_log(path):
+    """memory mapped session mat log, reader.records['grid'] is a (n, 12, 18) uint8 array"""
+    return RecordReader(path)
+
+class YogaMat:
+    '''
+    yoga mat device, the serial port is opened on first read and reopened with backoff after errors
+    port: serial port name, None -> null mode (headless, every read returns None)
+    transport: optional factory returning a serial-like object, e.g. lambda: MatReplay(path)
+    '''
+    def __init__(self, port=serial_port, baud=baud_rate, transport=None, min_backoff=0.5, max_backoff=10.0):
+        self.port = port
+        self.baud = baud
+        self.transport = transport
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff = min_backoff
+        self.next_retry = 0
+        self.ser = None
+        self.lock = threading.Lock()
+        # own lock of the history, self.lock is held during the blocking serial read
+        self.history_lock = threading.Lock()
+        self.history = deque(maxlen=32)
+
+    @property
+    def is_null(self):
+        return self.port is None and self.transport is None
+
+    @property
+    def connected(self):
+        return self.ser is not None
+
+    def _open(self):
+        now = time.monotonic()
+        if now < self.next_retry:
+            return False
+        try:
+            if self.transport is not None:
+                self.ser = self.transport()
+            else:
+                self.ser = serial.Serial(self.port, self.baud, timeout=1)
+            self.backoff = self.min_backoff
+            return True
+        except (serial.SerialException, OSError) as e:
+            print(f'yoga mat not available: {e}')
+            self.next_retry = now + self.backoff
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            return False
+
+    def _drop(self):
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+        self.ser = None
+        self.next_retry = time.monotonic() + self.backoff
+        self.backoff = min(self.backoff * 2, self.max_backoff)
+
+    def read(self):
+        """read one raw 12x18 grid, None if the mat is in null mode, currently unavailable or sent nothing within the port timeout"""
+        if self.is_null:
+            return None
+        with self.lock:
+            if self.ser is None and not self._open():
+                return None
+            try:
+                grid = read_raw_grid(self.ser)
+            except EOFError as e:
+                if self.transport is None:
+                    # empty read of the port timeout: the mat is idle, not disconnected, keep the port
+                    return None
+                # end of a transport such as MatReplay, reopened after the backoff
+                print(f'yoga mat stream ended: {e}')
+                self._drop()
+                return None
+            except (serial.SerialException, OSError) as e:
+                print(f'yoga mat disconnected: {e}')
+                self._drop()
+                return None
+        feature = MatFeature(grid)
+        with self.history_lock:
+            self.history.append((time.monotonic(), feature))
+        return grid
+
+    def latest(self):
+        """(timestamp, MatFeature) of the last grid read, None before the first read"""
+        with self.history_lock:
+            return self.history[-1] if self.history else None
+
+    def feature_at(self, t, max_age=0.2):
+        """MatFeature of the grid read closest to time.monotonic() timestamp t, None if none within max_age"""
+        # snapshot, the mat thread appends while the camera thread looks up
+        with self.history_lock:
+            items = list(self.history)
+        best, best_dt = None, max_age
+        for grid_t, feature in reversed(items):
+            dt = abs(grid_t - t)
+            if dt <= best_dt:
+                best, best_dt = feature, dt
+            elif grid_t < t:
+                break
+        return best
+
+    def close(self):
+        with self.lock:
+            if self.ser is not None:
+                self.ser.close()
+                self.ser = None
+
+def decode_raw_grid(data):
+    """decode one mat packet (hex string) into the raw 12x18 pressure grid, None if no header found or the packet is short"""
+    if header not in data:
+        return None
+    arr = data.split(header)
+    pre_data = arr[0]
+    next_data = arr[1]
+    a = next_data + pre_data
+    a = a[26:-8]
+    if len(a) < 432:
+        # partial read, e.g. the port timed out mid packet
+        return None
+    a = np.frombuffer(bytes.fromhex(a[:432]), dtype=np.uint8)
+    return a.reshape((12, 18))
+
+def diffuse_grid(raw_grid):
+    a = raw_grid.astype(int)
+    # diffuse 
+    dir = [[0,1],[1,0],[-1,0],[0,-1]]
+    for (x, y), value in np.ndenumerate(a):
+        if value> 100:
+            for addx,addy in dir:
+                if x+addx>=0 and x+addx<12 and y+addy>=0 and y+addy<18 and a[x+addx][y+addy]<60:
+                    a[x+addx][y+addy]=a[x+addx][y+addy]+value/4
+
+    a = (a > 60) * a
+    return a
+
+rows, cols = np.indices((12, 18))
+
+class MatFeature:
+    '''
+    per grid features computed once when the grid is read, shared by the pressure rules
+    grid: diffused grid
+    foot_count: number of contact regions (at least min_area cells)
+    stance_width: distance in cells between the two largest contact regions, 0 if less than two
+    cop: centre of pressure (row, col) in cells, None if nobody is on the mat
+    cop_x: centre of pressure along the long side of the mat, 0 ~ 1
+    left_ratio: weight on the first half of the long side, 0 ~ 1
+    '''
+    min_area = 2
+
+    def __init__(self, raw_grid):
+        self.grid = diffuse_grid(raw_grid)
+        self.total = int(self.grid.sum())
+        count, _, stats, centroids = cv2.connectedComponentsWithStats((self.grid > 0).astype(np.uint8), connectivity=4)
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        feet = np.argsort(areas)[::-1]
+        feet = feet[areas[feet] >= self.min_area]
+        self.foot_count = len(feet)
+        self.stance_width = 0.0
+        if self.foot_count >= 2:
+            self.stance_width = float(np.linalg.norm(centroids[feet[0] + 1] - centroids[feet[1] + 1]))
+        if self.total > 0:
+            self.cop = (float((rows * self.grid).sum() / self.total), float((cols * self.grid).sum() / self.total))
+            self.cop_x = self.cop[1] / 17
+            self.left_ratio = float(self.grid[:, :9].sum() / self.total)
+        else:
+            self.cop = None
+            self.cop_x = None
+            self.left_ratio = None
+
+def read_raw_grid(source):
+    """read packets from source (serial port or anything with read(n)) until one raw grid is decoded"""
     while True:
-        data = ser.read(237).hex()
-        if header in data:
-            arr = data.split(header)
-            pre_data = arr[0]
-            next_data = arr[1]
-            a = next_data + pre_data
-            a = a[26:-8]
-            a = [int("0x" + a[i:i+2], base=16) for i in range(0, 432, 2)]
-            a = np.array(a).reshape((12, 18))
-            # diffuse 
-            dir = [[0,1],[1,0],[-1,0],[0,-1]]
-            for (x, y), value in np.ndenumerate(a):
-                if value> 100:
-                    for addx,addy in dir:
-                        if x+addx>=0 and x+addx<12 and y+addy>=0 and y+addy<18 and a[x+addx][y+addy]<60:
-                            a[x+addx][y+addy]=a[x+addx][y+addy]+value/4
-
-            a = (a > 60) * a
-            return a
+        data = source.read(frame_size)
+        if len(data) == 0:
+            raise EOFError("yoga mat stream ended")
+        grid = decode_raw_grid(data.hex())
+        if grid is not None:
+            return grid
+
+def get_yoga_mat_data(source):
+    return diffuse_grid(read_raw_grid(source))
             
 
 def find_center(heatmap_arr):
@@ -53,15 +221,15 @@ def find_center(heatmap_arr):
     else:
         return np.array([])
     
-def get_heatmap():
-    data = get_yoga_mat_data()
-   
+def get_heatmap(source):
+    return render_heatmap(get_yoga_mat_data(source))
+
+def render_heatmap(data):
     rescaled_array = cv2.resize(data.astype('uint8'), dsize=(18 * enlarge , 12 * enlarge)) 
     rescaled_array = cv2.normalize(rescaled_array, None, 0, 255, norm_type= cv2.NORM_MINMAX, dtype= cv2.CV_8U)
     heatmap = cv2.applyColorMap(rescaled_array, cv2.COLORMAP_JET)
     center = find_center(data)
     rects = find_bounding_box(heatmap)
-    print(herotwo_pose_evaluate(center ,rects))
     if len(center)!=0 :
         cv2.circle(heatmap, [center[1], center[0]], 10, (255, 255, 255), 1)
     if  len(rects)> 1:
@@ -88,27 +256,18 @@ def find_bounding_box(heatmap):
         rects.append([x,y,w,h])
     return np.array(rects)
 
-def herotwo_pose_evaluate(center ,rects):
-    if len(rects) == 2 and abs( rects[0][2] - rects[1][2])>50:       
-        if rects[0][2] > rects[1][2]:
-            front_foot = rects[0]
-            rear_foot = rects[1]
-        else:
-            front_foot = rects[1]
-            rear_foot = rects[0]
-        front2center = abs(front_foot[0]+(front_foot[3]/2)-center[1]) 
-        rear2center = abs(rear_foot[0]+(rear_foot[3]/2)-center[1])
-        if front2center<rear2center and abs(front2center-rear2center)<100:
-            return True
-    return False
-
 
 if __name__ == "__main__":
     
-
+    mat = YogaMat()
     while True:
-        heatmap = get_heatmap()
+        grid = mat.read()
+        if grid is None:
+            time.sleep(0.5)
+            continue
+        heatmap = render_heatmap(diffuse_grid(grid))
         cv2.imshow("heatmap",heatmap)
         if cv2.waitKey(1) == ord('q'):
                 break
+    mat.close()
     cv2.destroyAllWindows()
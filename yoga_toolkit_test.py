@@ -1,6 +1,7 @@
 import os
 import cv2
 from yoga_toolkit.yogaPose import YogaPose
+import yoga_toolkit.landmarkCache as landmarkCache
 CWD = os.getcwd().replace("\\","/")
 
 # IMAGE_FILES = [f"{CWD}/yoga_toolkit/TreePose/Image/detect/test.jpg",
@@ -33,14 +34,15 @@ fps = cap.get(cv2.CAP_PROP_FPS)
 output = cv2.VideoWriter(storage_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (original_width, original_height))
 print(original_width,original_height)
 fps = cap.get(cv2.CAP_PROP_FPS)
-while True:
+# landmarks are computed once per video and then read from the cache
+landmarks, _ = landmarkCache.load(video_path)
+for point2d, point3d in landmarkCache.results(landmarks):
     ret, frame = cap.read()
     if not ret:
         print("Video end")
         break
-    frame = pose.detect(frame, original_width, original_height, False)
-    # 水平翻轉影片
-    frame = cv2.flip(frame, 180)
+    detected = pose.evaluate(point2d, point3d)
+    frame = pose.draw(original_width, original_height, frame, point2d if detected else None, mirror=False)
     print(pose.tips)
     cv2.imshow('image',frame)
     output.write(frame)